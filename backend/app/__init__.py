@@ -3,6 +3,7 @@ from config import Config
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from flask_migrate import Migrate
+from app.routing import RoutingSession, READ_BIND, add_read_bind, listen_read_engine
 import logging
 from logging.handlers import RotatingFileHandler
 import os
@@ -11,7 +12,11 @@ application = Flask(__name__)
 CORS(application, supports_credentials=True, origins='https://portfolioghostdev.ru') 
 application.config.from_object(Config)
 
-db = SQLAlchemy(application)
+add_read_bind(application)
+db = SQLAlchemy(application, session_options={'class_': RoutingSession})
+with application.app_context():
+    if READ_BIND in db.engines:
+        listen_read_engine(db.engines[READ_BIND])
 migrate = Migrate(application, db)
 
 if not application.debug:
@@ -27,6 +32,8 @@ if not application.debug:
 
 from app.api.handlers import api_bp
 application.register_blueprint(api_bp)
+from app.api import instrumentation
+from app.services import maintenance
 
 from app.models import user_model, project_model
 
@@ -1,5 +1,16 @@
 from wtforms import StringField, DateField, DecimalField, IntegerField, TextAreaField, SelectField, FloatField, Form, FieldList, FormField
-from wtforms.validators import DataRequired, Optional, Length, NumberRange
+from wtforms.validators import DataRequired, Optional, Length, NumberRange, ValidationError
+from datetime import datetime
+
+
+def date_format(form, field):
+    # формы заполняются через data=, а так DateField строку не разбирает — проверяем сами
+    if isinstance(field.data, str):
+        try:
+            datetime.strptime(field.data, field.format[0])
+        except ValueError:
+            raise ValidationError('Dates must be in YYYY-MM-DD format')
+
 
 class FloorForm(Form):
     number = StringField('Number', validators=[DataRequired(), Length(max=64)])
@@ -35,8 +46,8 @@ class ExecutorForm(Form):
 class WorkForm(Form):
     executor_id = IntegerField('Executor ID', validators=[DataRequired()])
     work_type_id = IntegerField('Work Type ID', validators=[DataRequired()])
-    start_date = DateField('Start Date', format='%Y-%m-%d', validators=[DataRequired()])
-    end_date = DateField('End Date', format='%Y-%m-%d', validators=[DataRequired()])
+    start_date = DateField('Start Date', format='%Y-%m-%d', validators=[DataRequired(), date_format])
+    end_date = DateField('End Date', format='%Y-%m-%d', validators=[DataRequired(), date_format])
     status = SelectField('Status', choices=[('not-started', 'Not Started'), ('in-progress', 'In Progress'), ('completed', 'Completed'), ('overdue', 'Overdue')], validators=[DataRequired()])
     priority = StringField('Priority', validators=[DataRequired()])
     progress = IntegerField('Progress', validators=[NumberRange(min=0, max=100)])
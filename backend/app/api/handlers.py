@@ -7,52 +7,56 @@ from app.models.object_model import Object
 from app.models.work_model import Work
 from app.models.work_type_model import WorkType
 from app.models.executor_model import Executor
+from app.services.serializers import to_dict
+from app.services import (
+    read_models, work_filters, rollups, changes, work_writes, work_import, work_export, generator, metrics,
+    project_tree
+)
+from app.services.storage import retry_on_busy
+from app.services.keyset import paginate
+from app.services.events import broker, backlog, format_event
 from app import db
-from flask import jsonify, request, abort
+from flask import Response, current_app, jsonify, request, abort, stream_with_context
 from . import api_bp
+from .streaming import json_array_response, chunk_size
 from datetime import datetime, timedelta, date
 from typing import List
+import sqlalchemy as sa
 import random
 
-def to_dict(instance):
-    if not instance:
-        return None
-    
-    result = {}
-    for column in instance.__table__.columns:
-        value = getattr(instance, column.name)
-        if isinstance(value, (datetime, date)):
-            result[column.name] = value.isoformat().split('T')[0]
-        else:
-            result[column.name] = value
-    
-    if hasattr(instance, 'blocks'):
-        blocks_list = []
-        for block in sorted(instance.blocks, key=lambda b: b.name):
-            floors = sorted(
-                [{'id': floor.id, 'number': floor.number} for floor in block.floors], 
-                key=lambda f: str(f['number'])
-            )
-            blocks_list.append({'id': block.id, 'name': block.name, 'floors': floors})
-        result['blocks'] = blocks_list
-
-    if hasattr(instance, 'objects'):
-        result['objects'] = sorted(
-            [{'id': obj.id, 'name': obj.name} for obj in instance.objects],
-            key=lambda o: o['name']
-        )
+def parse_date(value):
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value), '%Y-%m-%d').date()
+
+
+def work_values(form):
+    return {
+        'executor_id': form.executor_id.data,
+        'work_type_id': form.work_type_id.data,
+        'start_date': parse_date(form.start_date.data),
+        'end_date': parse_date(form.end_date.data),
+        'status': form.status.data,
+        'priority': form.priority.data,
+        'progress': form.progress.data,
+        'note': form.note.data,
+        'floor_id': form.floor_id.data,
+        'object_id': form.object_id.data
+    }
+
 
-    if isinstance(instance, Work):
-        result['project'] = instance.floor.block.project.code if instance.floor and instance.floor.block and instance.floor.block.project else None
-        result['block'] = instance.floor.block.name if instance.floor and instance.floor.block else None
-        result['floor'] = instance.floor.number if instance.floor else None
-        result['object'] = instance.object.name if instance.object else None
-        result['workType'] = instance.work_type_rel.name if instance.work_type_rel else None
-        result['executor'] = instance.executor_rel.name if instance.executor_rel else None
-        result['techOrder'] = instance.work_type_rel.order if instance.work_type_rel else None
-        result['category'] = instance.work_type_rel.category if instance.work_type_rel else None
+def is_id(value):
+    # bool в Python тоже int, но True/False не id
+    return isinstance(value, int) and not isinstance(value, bool)
 
-    return result
+
+def keyset_response(statement, keys, serialize):
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+    try:
+        rows, next_cursor, prev_cursor = paginate(statement, keys, limit, request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'items': [serialize(row) for row in rows], 'next': next_cursor, 'prev': prev_cursor})
 
 
 @api_bp.route('/ping', methods=['GET'])
@@ -60,19 +64,25 @@ def ping():
     return 'Я живой!'
 
 
+@api_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.exposition(), mimetype='text/plain; version=0.0.4')
+
+
 @api_bp.route('/projects', methods=['GET'])
 def get_projects():
-    projects = Project.query.all()
-    return jsonify([to_dict(p) for p in projects])
+    projects = read_models.projects_query().yield_per(chunk_size())
+    return json_array_response(to_dict(p) for p in projects)
 
 
 @api_bp.route('/projects/<string:code>', methods=['GET'])
 def get_project(code):
-    project = Project.query.filter_by(code=code).first_or_404()
+    project = read_models.projects_query().filter_by(code=code).first_or_404()
     return jsonify(to_dict(project))
 
 
 @api_bp.route('/projects', methods=['POST'])
+@retry_on_busy
 def create_project():
     data = request.json or {}
     form = ProjectForm(data=data)
@@ -130,11 +140,14 @@ def create_project():
                 obj = Object(name=str(obj_name), project=project)
                 db.session.add(obj)
 
+    db.session.flush()
+    changes.record('project', 'created', [project.id])
     db.session.commit()
     return jsonify(to_dict(project)), 201
 
 
 @api_bp.route('/projects/<string:code>', methods=['PUT'])
+@retry_on_busy
 def update_project(code):
     project = Project.query.filter_by(code=code).first_or_404()
     data = request.json or {}
@@ -160,76 +173,151 @@ def update_project(code):
         
         project.budget = form.budget.data
 
-        new_blocks_data = data.get('blocks', [])
-        existing_block_names = {block.name for block in project.blocks}
-        new_block_names = {block_data['name'] for block_data in new_blocks_data}
-        
-        blocks_to_delete = [b for b in project.blocks if b.name not in new_block_names]
-        for block in blocks_to_delete:
-            db.session.delete(block)
-        
-        for block_data in new_blocks_data:
-            block_name = block_data['name']
-            if block_name in existing_block_names:
-                block = next(b for b in project.blocks if b.name == block_name)
-                existing_floor_numbers = {f.number for f in block.floors}
-                new_floor_numbers = {str(fn) for fn in block_data.get('floors', [])}
-
-                floors_to_delete = [f for f in block.floors if f.number not in new_floor_numbers]
-                for floor in floors_to_delete:
-                    db.session.delete(floor)
-                
-                floors_to_add = new_floor_numbers - existing_floor_numbers
-                for floor_number in floors_to_add:
-                    floor = Floor(number=str(floor_number), block=block)
-                    db.session.add(floor)
-            else:
-                block = Block(name=block_name, project=project)
-                db.session.add(block)
-                db.session.flush()
-                for floor_number in block_data.get('floors', []):
-                    floor = Floor(number=str(floor_number), block=block)
-                    db.session.add(floor)
-
-        new_objects_data = data.get('objects', [])
-        existing_object_names = {obj.name for obj in project.objects}
-        new_object_names = set(new_objects_data)
-
-        objects_to_delete = [obj for obj in project.objects if obj.name not in new_object_names]
-        for obj in objects_to_delete:
-            db.session.delete(obj)
-
-        objects_to_add = new_object_names - existing_object_names
-        for obj_name in objects_to_add:
-            obj = Object(name=str(obj_name), project=project)
-            db.session.add(obj)
+        project_tree.sync(project.id, data.get('blocks', []), data.get('objects', []))
 
+        db.session.flush()
+        rollups.rebuild([project.id])
+        changes.record('project', 'updated', [project.id])
         db.session.commit()
-        return jsonify(to_dict(project))
+        return jsonify(to_dict(read_models.projects_query().filter_by(id=project.id).one()))
     return jsonify(form.errors), 400
 
 
 @api_bp.route('/projects/<string:code>', methods=['DELETE'])
+@retry_on_busy
 def delete_project(code):
     project = Project.query.filter_by(code=code).first_or_404()
+    project_id = project.id
+    work_writes.delete_works(sa.or_(
+        Work.floor_id.in_(sa.select(Floor.id).join(Block).where(Block.project_id == project_id)),
+        Work.object_id.in_(sa.select(Object.id).where(Object.project_id == project_id))
+    ))
     db.session.delete(project)
+    db.session.flush()
+    rollups.rebuild([project_id])
+    changes.record('project', 'deleted', [project_id])
     db.session.commit()
     return jsonify({'message': 'Project deleted'}), 204
 
 
 @api_bp.route('/works', methods=['GET'])
 def get_works():
-    works = Work.query.all()
-    return jsonify([to_dict(w) for w in works])
+    keyset = 'cursor' in request.args or 'limit' in request.args
+    error = work_filters.validate_work_args(request.args, keyset)
+    if error:
+        return jsonify({'error': error}), 400
+
+    version = changes.current_version()
+    statement = work_filters.apply_work_args(read_models.works_select(), request.args)
+    if keyset:
+        response = keyset_response(
+            statement, work_filters.sort_keys(request.args), read_models.work_row_to_dict
+        )
+    elif 'page' not in request.args and 'per_page' not in request.args:
+        response = json_array_response(read_models.iter_works(statement, chunk_size=chunk_size()))
+    else:
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', 50, type=int), 1), 500)
+        items = list(read_models.iter_works(statement.limit(per_page).offset((page - 1) * per_page)))
+        total = work_filters.count_works(request.args)
+        response = jsonify({'items': items, 'total': total, 'page': page, 'per_page': per_page})
+
+    if isinstance(response, tuple):
+        return response
+    response.headers['X-Changes-Version'] = str(version)
+    return response
+
+
+@api_bp.route('/works/export', methods=['GET'])
+def export_works():
+    fmt = request.args.get('format', 'csv')
+    if fmt not in work_export.FORMATS:
+        return jsonify({'error': f'Unknown format: {fmt}'}), 400
+    error = work_filters.validate_work_args(request.args)
+    if error:
+        return jsonify({'error': error}), 400
+
+    statement = work_filters.apply_work_args(read_models.works_select(), request.args)
+    statement = statement.execution_options(stream_results=True)
+    rows = read_models.iter_works(statement, chunk_size=chunk_size())
+    writer = work_export.iter_csv if fmt == 'csv' else work_export.iter_ndjson
+    chunks = writer(rows, chunk_size())
+    return Response(stream_with_context(chunks), mimetype=work_export.MIMETYPES[fmt], headers={
+        'Content-Disposition': f'attachment; filename=works.{fmt}'
+    })
+
+
+@api_bp.route('/works/changes', methods=['GET'])
+def get_works_changes():
+    since = request.args.get('since', type=int)
+    if since is None or since < 0:
+        return jsonify({'error': 'since must be a non-negative integer'}), 400
+    version, rows, deleted = changes.work_changes_since(since, read_models.works_select())
+    return jsonify({
+        'version': version,
+        'works': [read_models.work_row_to_dict(row) for row in rows],
+        'deleted': deleted
+    })
+
+
+@api_bp.route('/works/stats', methods=['GET'])
+def get_works_stats():
+    error = work_filters.validate_work_args(request.args)
+    if error:
+        return jsonify({'error': error}), 400
+    return jsonify(read_models.work_stats(work_filters.work_conditions(request.args)))
+
+
+@api_bp.route('/works/rollup', methods=['GET'])
+def get_works_rollup():
+    return jsonify(read_models.work_rollup())
+
+
+@api_bp.route('/events', methods=['GET'])
+def stream_events():
+    # 0 крутил бы цикл ожидания вхолостую, отрицательное уронило бы поток после заголовков
+    keepalive = min(max(request.args.get('keepalive', 15, type=int), 1), 60)
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    # подписка раньше чтения журнала: событие между ними придёт дважды, но не пропадёт
+    subscription = broker.subscribe()
+    try:
+        missed = (0, []) if last_event_id is None or last_event_id < 0 else backlog(last_event_id, broker.queue_size)
+    except Exception:
+        broker.unsubscribe(subscription)
+        raise
+
+    def generate():
+        try:
+            yield 'retry: 3000\n\n'
+            if missed is not None:
+                seen, events = missed
+                for event in events:
+                    yield format_event(event)
+                for event in subscription.events(keepalive):
+                    if event is None:
+                        yield ': keep-alive\n\n'
+                    elif event['version'] > seen:
+                        yield format_event(event)
+            yield 'event: resync\ndata: {}\n\n'
+        finally:
+            broker.unsubscribe(subscription)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
 
 
 @api_bp.route('/works/<int:id>', methods=['GET'])
 def get_work(id):
-    work = Work.query.get_or_404(id)
-    return jsonify(to_dict(work))
+    work = read_models.get_work(id)
+    if work is None:
+        abort(404)
+    return jsonify(work)
 
 
 @api_bp.route('/works', methods=['POST'])
+@retry_on_busy
 def create_work():
     data = request.json or {}
     form = WorkForm(data=data)
@@ -248,19 +336,114 @@ def create_work():
             object_id=form.object_id.data
         )
         db.session.add(work)
+        db.session.flush()
+        changes.record_works('created', [work])
+        rollups.apply_work_changes([(work.floor_id, work.status, work.progress, 1)])
         db.session.commit()
+        work = read_models.works_query().filter_by(id=work.id).one()
         return jsonify(to_dict(work)), 201
     
     return jsonify(form.errors), 400
 
 
+@api_bp.route('/works/bulk', methods=['POST'])
+@retry_on_busy
+def bulk_works():
+    data = request.json or {}
+    operations = {key: data.get(key) or [] for key in ('create', 'update', 'delete')}
+    if not all(isinstance(items, list) for items in operations.values()):
+        return jsonify({'error': 'create, update and delete must be lists'}), 400
+    max_items = current_app.config.get('BULK_MAX_ITEMS', 5000)
+    if sum(len(items) for items in operations.values()) > max_items:
+        return jsonify({'error': f'At most {max_items} operations per request'}), 400
+
+    errors = {'create': {}, 'update': {}, 'delete': {}}
+    creates, updates = [], []
+    for kind, target in (('create', creates), ('update', updates)):
+        for index, item in enumerate(operations[kind]):
+            item = item if isinstance(item, dict) else {}
+            form = WorkForm(data=item)
+            if not form.validate():
+                errors[kind][index] = form.errors
+                continue
+            values = work_values(form)
+            if kind == 'update':
+                if not is_id(item.get('id')):
+                    errors[kind][index] = {'id': ['Work id is required']}
+                    continue
+                values['id'] = item['id']
+            target.append((index, values))
+
+    delete_ids = []
+    for index, work_id in enumerate(operations['delete']):
+        if is_id(work_id):
+            delete_ids.append((index, work_id))
+        else:
+            errors['delete'][index] = {'id': ['Work id is required']}
+
+    for kind, items in (('create', creates), ('update', updates)):
+        for (index, _), row_errors in zip(items, work_writes.reference_errors([values for _, values in items])):
+            if row_errors:
+                errors[kind][index] = row_errors
+    known_ids = work_writes.existing_work_ids(
+        [values['id'] for _, values in updates] + [work_id for _, work_id in delete_ids]
+    )
+    for kind, ids in (('update', [(i, v['id']) for i, v in updates]), ('delete', delete_ids)):
+        seen = set()
+        for index, work_id in ids:
+            if work_id not in known_ids:
+                errors[kind][index] = {'id': ['Work not found']}
+            elif work_id in seen:
+                errors[kind][index] = {'id': ['Duplicate work id']}
+            seen.add(work_id)
+
+    if any(errors.values()):
+        return jsonify({'errors': errors}), 400
+
+    created = work_writes.insert_works([values for _, values in creates])
+    updated = work_writes.update_works([values for _, values in updates])
+    deleted = work_writes.delete_works(Work.id.in_([work_id for _, work_id in delete_ids]))
+    db.session.commit()
+    return jsonify({
+        'created': [{'index': index, 'id': work_id} for (index, _), work_id in zip(creates, created)],
+        'updated': updated,
+        'deleted': deleted
+    })
+
+
+@api_bp.route('/works/import', methods=['POST'])
+def import_works():
+    fmt = request.args.get('format') or ('csv' if request.mimetype == 'text/csv' else 'ndjson')
+    if fmt not in work_import.FORMATS:
+        return jsonify({'error': f'Unknown format: {fmt}'}), 400
+    batch_size = min(max(request.args.get('batch_size', 1000, type=int), 1), 10000)
+
+    rejects = []
+    max_rejects = current_app.config.get('IMPORT_MAX_REPORTED_REJECTS', 1000)
+
+    def on_reject(line_no, row, error):
+        if len(rejects) < max_rejects:
+            rejects.append({'line': line_no, 'error': error, 'row': row})
+
+    def on_batch(summary):
+        current_app.logger.info('Work import: %(imported)s imported, %(rejected)s rejected', summary)
+
+    summary = work_import.import_works(
+        work_import.iter_rows(request.stream, fmt), batch_size, on_reject, on_batch
+    )
+    summary['rejects'] = rejects
+    return jsonify(summary), 201 if summary['imported'] else 200
+
+
 @api_bp.route('/works/<int:id>', methods=['PUT'])
+@retry_on_busy
 def update_work(id):
     work = Work.query.get_or_404(id)
     data = request.json or {}
     form = WorkForm(data=data)
     
     if form.validate():
+        previous = (work.floor_id, work.status, work.progress, -1)
         work.executor_id = form.executor_id.data
         work.work_type_id = form.work_type_id.data
         work.start_date = datetime.strptime(data['start_date'], '%Y-%m-%d').date()
@@ -271,14 +454,20 @@ def update_work(id):
         work.note = form.note.data
         work.floor_id = form.floor_id.data
         work.object_id = form.object_id.data
+        changes.record_works('updated', [work])
+        rollups.apply_work_changes([previous, (work.floor_id, work.status, work.progress, 1)])
         db.session.commit()
+        work = read_models.works_query().filter_by(id=work.id).one()
         return jsonify(to_dict(work))
     return jsonify(form.errors), 400
 
 
 @api_bp.route('/works/<int:id>', methods=['DELETE'])
+@retry_on_busy
 def delete_work(id):
     work = Work.query.get_or_404(id)
+    changes.record_works('deleted', [work])
+    rollups.apply_work_changes([(work.floor_id, work.status, work.progress, -1)])
     db.session.delete(work)
     db.session.commit()
     return jsonify({'message': 'Work deleted'}), 204
@@ -286,11 +475,12 @@ def delete_work(id):
 
 @api_bp.route('/work_types', methods=['GET'])
 def get_work_types():
-    work_types = WorkType.query.all()
-    return jsonify([to_dict(wt) for wt in work_types])
+    work_types = WorkType.query.yield_per(chunk_size())
+    return json_array_response(to_dict(wt) for wt in work_types)
 
 
 @api_bp.route('/work_types', methods=['POST'])
+@retry_on_busy
 def create_work_type():
     data = request.json or {}
     form = WorkTypeForm(data=data)
@@ -309,11 +499,18 @@ def create_work_type():
 
 @api_bp.route('/executors', methods=['GET'])
 def get_executors():
-    executors = Executor.query.all()
-    return jsonify([to_dict(e) for e in executors])
+    if 'cursor' in request.args or 'limit' in request.args:
+        keys = ((Executor.id, False),)
+        if request.args.get('sort') == 'name':
+            keys = ((Executor.name, False),) + keys
+        return keyset_response(sa.select(Executor), keys, lambda row: to_dict(row[0]))
+
+    executors = Executor.query.yield_per(chunk_size())
+    return json_array_response(to_dict(e) for e in executors)
 
 
 @api_bp.route('/executors', methods=['POST'])
+@retry_on_busy
 def create_executor():
     data = request.json or {}
     form = ExecutorForm(data=data)
@@ -328,8 +525,10 @@ def create_executor():
 
 
 @api_bp.route('/seed_data', methods=['POST'])
+@retry_on_busy
 def seed_data():
-    db.session.query(Work).delete()
+    work_writes.delete_works(sa.true())
+    changes.record('project', 'deleted', db.session.scalars(sa.select(Project.id)).all())
     db.session.query(Floor).delete()
     db.session.query(Block).delete()
     db.session.query(Object).delete()
@@ -338,38 +537,11 @@ def seed_data():
     db.session.query(Project).delete()
     db.session.commit()
 
-    work_types_data = [
-        {"name": "Штукатурка", "order": 1, "color": "#e53e3e", "category": "Черновые работы"},
-        {"name": "Стяжка", "order": 2, "color": "#fd7900", "category": "Черновые работы"},
-        {"name": "Утеплитель", "order": 3, "color": "#fbb917", "category": "Черновые работы"},
-        {"name": "Шпаклёвка", "order": 4, "color": "#38a169", "category": "Отделочные работы"},
-        {"name": "Шпатлёвка", "order": 4, "color": "#38a169", "category": "Отделочные работы"},
-        {"name": "Плитка", "order": 5, "color": "#3182ce", "category": "Отделочные работы"},
-        {"name": "Сапожок", "order": 6, "color": "#805ad5", "category": "Отделочные работы"},
-        {"name": "ГКЛ", "order": 7, "color": "#9c88ff", "category": "Конструкции"},
-        {"name": "Армстронг", "order": 8, "color": "#48bb78", "category": "Потолки"},
-        {"name": "Грильято", "order": 9, "color": "#ed8936", "category": "Потолки"},
-        {"name": "Кварц винил", "order": 10, "color": "#38b2ac", "category": "Напольные покрытия"},
-        {"name": "Шкурка", "order": 11, "color": "#667eea", "category": "Отделочные работы"},
-        {"name": "Покраска", "order": 12, "color": "#e53e3e", "category": "Отделочные работы"},
-        {"name": "Покраска стен", "order": 13, "color": "#718096", "category": "Отделочные работы"},
-        {"name": "Сапожок (после дверников)", "order": 14, "color": "#4a5568", "category": "Отделочные работы"},
-        {"name": "Заделка штроб под радиатором", "order": 15, "color": "#2d3748", "category": "Специальные работы"},
-        {"name": "Дверные откосы внутри квартиры", "order": 16, "color": "#1a202c", "category": "Специальные работы"},
-        {"name": "Монтаж плитки на подоконники", "order": 17, "color": "#e53e3e", "category": "Специальные работы"},
-        {"name": "Монтаж плитки на лифтовые порталы", "order": 18, "color": "#718096", "category": "Специальные работы"},
-        {"name": "Монтаж табличек", "order": 19, "color": "#fd7900", "category": "Завершающие работы"},
-        {"name": "Уборка", "order": 20, "color": "#38a169", "category": "Завершающие работы"}
-    ]
-    seeded_work_types = {wt_data['name']: WorkType(**wt_data) for wt_data in work_types_data}
+    seeded_work_types = {wt_data['name']: WorkType(**wt_data) for wt_data in generator.WORK_TYPES}
     db.session.add_all(seeded_work_types.values())
     db.session.commit()
 
-    executors_data = [
-        "СМР Майкоп", "СМР Гулькевичи", "СМР Кропоткин", "Бригада №1", "Бригада №2", 
-        "Электрики", "Сантехники", "Отделочники", "Универсалы", "Подрядчик А", "Подрядчик Б"
-    ]
-    seeded_executors = {ex_name: Executor(name=ex_name) for ex_name in executors_data}
+    seeded_executors = {ex_name: Executor(name=ex_name) for ex_name in generator.EXECUTORS}
     db.session.add_all(seeded_executors.values())
     db.session.commit()
 
@@ -437,25 +609,21 @@ def seed_data():
             budget=p_data.get('budget')
         )
         db.session.add(project)
-        db.session.flush()
         seeded_projects[project.code] = project
         
         for block_data in p_data.get('blocks', []):
             block = Block(name=block_data['name'], project=project)
             db.session.add(block)
-            db.session.flush()
             seeded_blocks[f"{project.code}-{block.name}"] = block
             
             for floor_number in block_data['floors']:
                 floor = Floor(number=str(floor_number), block=block)
                 db.session.add(floor)
-                db.session.flush()
                 seeded_floors[f"{project.code}-{block.name}-{floor.number}"] = floor
 
         for obj_name in p_data.get('objects', []):
             obj = Object(name=str(obj_name), project=project)
             db.session.add(obj)
-            db.session.flush()
             seeded_objects[f"{project.code}-{obj.name}"] = obj
     
     db.session.commit()
@@ -506,9 +674,12 @@ def seed_data():
         }
         works_data.append(work_data)
 
-    for w_data in works_data:
-        work = Work(**w_data)
-        db.session.add(work)
+    seeded_works = [Work(**w_data) for w_data in works_data]
+    db.session.add_all(seeded_works)
+    db.session.flush()
+    changes.record_works('created', seeded_works)
+    changes.record('project', 'created', [project.id for project in seeded_projects.values()])
+    rollups.rebuild()
     db.session.commit()
 
     return jsonify({'message': 'Database seeded successfully'}), 201
\ No newline at end of file
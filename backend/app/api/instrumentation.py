@@ -0,0 +1,70 @@
+import time
+from flask import g, request
+from app import application
+from app.services import query_log
+from app.services.metrics import store
+
+
+def _route():
+    # шаблон маршрута, а не путь: /api/works/<int:id> вместо тысяч отдельных серий
+    return request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+
+
+def _counting(iterable, state):
+    try:
+        for chunk in iterable:
+            state['size'] += len(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+            yield chunk
+    finally:
+        if hasattr(iterable, 'close'):
+            iterable.close()
+
+
+def _finish(state, status):
+    if state.get('finished'):
+        return
+    state['finished'] = True
+    labels = (('method', state['method']), ('route', state['route']))
+    store.observe('http_request_duration_seconds', labels, time.perf_counter() - state['started'])
+    store.observe('http_response_size_bytes', labels, state['size'])
+    store.inc('http_requests_total', labels + (('status', str(status)),))
+    store.inc('http_requests_in_flight', labels, -1)
+    query_log.report(state['queries'], state['method'], state['path'], state['route'], status)
+    store.flush()
+
+
+@application.before_request
+def _start_request():
+    g.metrics = {
+        'started': time.perf_counter(),
+        'method': request.method,
+        'path': request.path,
+        'route': _route(),
+        'size': 0,
+        'queries': query_log.start(),
+    }
+    store.inc('http_requests_in_flight', (('method', request.method), ('route', g.metrics['route'])))
+
+
+@application.after_request
+def _record_response(response):
+    state = g.pop('metrics', None)
+    if state is None:
+        return response
+    # у потоковых ответов заголовок учитывает только запросы до начала тела, лог — все
+    response.headers.add('Server-Timing', state['queries'].server_timing())
+    # для потоковых ответов замер заканчивается, когда сервер закрыл тело
+    if response.is_streamed:
+        response.response = _counting(response.response, state)
+    else:
+        state['size'] = response.content_length or 0
+    response.call_on_close(lambda: _finish(state, response.status_code))
+    return response
+
+
+@application.teardown_request
+def _abandon_request(exc):
+    # after_request не вызывался — запрос оборвался исключением до формирования ответа
+    state = g.pop('metrics', None)
+    if state is not None:
+        _finish(state, 500)
@@ -0,0 +1,25 @@
+from itertools import islice
+from flask import Response, current_app, stream_with_context
+
+
+def chunk_size():
+    return current_app.config.get('STREAM_CHUNK_SIZE', 500)
+
+
+def json_array_response(items, status=200):
+    size = chunk_size()
+    dumps = current_app.json.dumps
+
+    def generate():
+        iterator = iter(items)
+        separator = ''
+        yield '['
+        while True:
+            chunk = list(islice(iterator, size))
+            if not chunk:
+                break
+            yield separator + ','.join(dumps(item, separators=(',', ':')) for item in chunk)
+            separator = ','
+        yield ']'
+
+    return Response(stream_with_context(generate()), status=status, mimetype='application/json')
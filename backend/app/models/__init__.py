@@ -3,4 +3,6 @@ from .project_model import Project
 from .object_model import Object
 from .block_model import Block
 from .floor_model import Floor
-from .work_model import Work
\ No newline at end of file
+from .work_model import Work
+from .rollup_model import FloorRollup, BlockRollup, ProjectRollup
+from .change_model import ChangeLog
@@ -0,0 +1,19 @@
+import sqlalchemy as sa
+import sqlalchemy.orm as so
+from app import db
+
+
+class ChangeLog(db.Model):
+    __tablename__ = "change_log"
+    __table_args__ = (
+        sa.Index("ix_change_log_entity_version", "entity", "version"),
+        {"sqlite_autoincrement": True},
+    )
+
+    version: so.Mapped[int] = so.mapped_column(primary_key=True)
+    entity: so.Mapped[str] = so.mapped_column(sa.String(32))
+    entity_id: so.Mapped[int] = so.mapped_column(sa.Integer)
+    op: so.Mapped[str] = so.mapped_column(sa.String(16))
+
+    def __repr__(self):
+        return f"<ChangeLog {self.version} {self.op} {self.entity} {self.entity_id}>"
@@ -0,0 +1,47 @@
+import sqlalchemy as sa
+import sqlalchemy.orm as so
+from app import db
+
+
+class RollupCounters:
+    works_count: so.Mapped[int] = so.mapped_column(sa.Integer, default=0)
+    not_started_count: so.Mapped[int] = so.mapped_column(sa.Integer, default=0)
+    in_progress_count: so.Mapped[int] = so.mapped_column(sa.Integer, default=0)
+    completed_count: so.Mapped[int] = so.mapped_column(sa.Integer, default=0)
+    progress_sum: so.Mapped[int] = so.mapped_column(sa.Integer, default=0)
+
+
+class FloorRollup(RollupCounters, db.Model):
+    __tablename__ = "floor_rollups"
+
+    floor_id: so.Mapped[int] = so.mapped_column(
+        sa.ForeignKey("floors.id", ondelete="CASCADE"), primary_key=True
+    )
+    block_id: so.Mapped[int] = so.mapped_column(sa.Integer, index=True)
+    project_id: so.Mapped[int] = so.mapped_column(sa.Integer, index=True)
+
+    def __repr__(self):
+        return f"<FloorRollup {self.floor_id}: {self.works_count} works>"
+
+
+class BlockRollup(RollupCounters, db.Model):
+    __tablename__ = "block_rollups"
+
+    block_id: so.Mapped[int] = so.mapped_column(
+        sa.ForeignKey("blocks.id", ondelete="CASCADE"), primary_key=True
+    )
+    project_id: so.Mapped[int] = so.mapped_column(sa.Integer, index=True)
+
+    def __repr__(self):
+        return f"<BlockRollup {self.block_id}: {self.works_count} works>"
+
+
+class ProjectRollup(RollupCounters, db.Model):
+    __tablename__ = "project_rollups"
+
+    project_id: so.Mapped[int] = so.mapped_column(
+        sa.ForeignKey("projects.id", ondelete="CASCADE"), primary_key=True
+    )
+
+    def __repr__(self):
+        return f"<ProjectRollup {self.project_id}: {self.works_count} works>"
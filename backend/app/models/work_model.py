@@ -1,5 +1,7 @@
+from datetime import date
 import sqlalchemy as sa
 import sqlalchemy.orm as so
+from sqlalchemy.ext.hybrid import hybrid_property
 from app import db
 
 from app.models.floor_model import Floor
@@ -7,8 +9,28 @@ from app.models.work_type_model import WorkType
 from app.models.executor_model import Executor
 from typing import List
 
+TODAY = sa.func.date('now', 'localtime')
+
+
+def progress_state(status, progress):
+    # часть статуса, не зависящая от даты: её можно копить в rollup-счётчиках
+    if status == 'completed' or progress >= 100:
+        return 'completed'
+    if status == 'in-progress' or progress > 0:
+        return 'in-progress'
+    return 'not-started'
+
+
 class Work(db.Model):
     __tablename__ = "works"
+    __table_args__ = (
+        sa.Index("ix_works_start_date_id", "start_date", "id"),
+        sa.Index("ix_works_end_date_id", "end_date", "id"),
+        sa.Index("ix_works_priority_id", "priority", "id"),
+        sa.Index("ix_works_progress_id", "progress", "id"),
+        sa.Index("ix_works_end_date_progress", "end_date", "progress", "status"),
+        sa.Index("ix_works_tech_order_id", "tech_order", "id"),
+    )
 
     id: so.Mapped[int] = so.mapped_column(primary_key=True)
 
@@ -21,6 +43,10 @@ class Work(db.Model):
         sa.ForeignKey("work_types.id", ondelete="CASCADE"), index=True
     )
     work_type_rel: so.Mapped["WorkType"] = so.relationship(back_populates="works")
+    # копия work_types.order: курсорной сортировке «по технологии» нужен индекс на самой works
+    tech_order: so.Mapped[int] = so.mapped_column(
+        sa.Integer, default=0, server_default="0", info={'serialize': False}
+    )
 
     start_date: so.Mapped[sa.Date] = so.mapped_column(sa.Date)
     end_date: so.Mapped[sa.Date] = so.mapped_column(sa.Date)
@@ -28,6 +54,7 @@ class Work(db.Model):
     priority: so.Mapped[int] = so.mapped_column(sa.Integer)
     progress: so.Mapped[int] = so.mapped_column(sa.Integer)
     note: so.Mapped[str] = so.mapped_column(sa.Text, nullable=True)
+    version: so.Mapped[int] = so.mapped_column(sa.Integer, default=0, server_default="0", index=True)
 
     floor_id: so.Mapped[int] = so.mapped_column(
         sa.ForeignKey("floors.id", ondelete="CASCADE"), index=True
@@ -39,5 +66,64 @@ class Work(db.Model):
     )
     object: so.Mapped["Object"] = so.relationship(back_populates="works")
 
+    # Статус «просрочено» зависит от текущей даты, поэтому не хранится, а вычисляется;
+    # в SQL сегодняшняя дата берётся из SQLite (localtime, как date.today()).
+
+    @hybrid_property
+    def is_completed(self):
+        return self.status == 'completed' or self.progress >= 100
+
+    @is_completed.inplace.expression
+    @classmethod
+    def _is_completed_expression(cls):
+        return sa.or_(cls.status == 'completed', cls.progress >= 100)
+
+    @hybrid_property
+    def is_overdue(self):
+        return not self.is_completed and self.end_date < date.today()
+
+    @is_overdue.inplace.expression
+    @classmethod
+    def _is_overdue_expression(cls):
+        # диапазон по end_date, а progress и status проверяются в ix_works_end_date_progress
+        # без обращения к таблице
+        return sa.and_(cls.end_date < TODAY, cls.progress < 100, cls.status != 'completed')
+
+    @hybrid_property
+    def progress_state(self):
+        return progress_state(self.status, self.progress)
+
+    @progress_state.inplace.expression
+    @classmethod
+    def _progress_state_expression(cls):
+        return sa.case(
+            (cls.is_completed, 'completed'),
+            (sa.or_(cls.status == 'in-progress', cls.progress > 0), 'in-progress'),
+            else_='not-started'
+        )
+
+    @hybrid_property
+    def effective_status(self):
+        if self.is_overdue:
+            return 'overdue'
+        return self.progress_state
+
+    @effective_status.inplace.expression
+    @classmethod
+    def _effective_status_expression(cls):
+        return sa.case(
+            (cls.is_completed, 'completed'),
+            (cls.end_date < TODAY, 'overdue'),
+            (sa.or_(cls.status == 'in-progress', cls.progress > 0), 'in-progress'),
+            else_='not-started'
+        )
+
     def __repr__(self):
         return f"<Work {self.work_type_rel.name} (Project: {self.floor.block.project.name})>"
+
+
+@sa.event.listens_for(Work, 'before_insert')
+@sa.event.listens_for(Work, 'before_update')
+def _copy_tech_order(mapper, connection, target):
+    # пакетные вставки и обновления через Core проставляют tech_order сами (work_writes, generator)
+    target.tech_order = sa.select(WorkType.order).where(WorkType.id == target.work_type_id).scalar_subquery()
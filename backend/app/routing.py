@@ -0,0 +1,62 @@
+import os
+import sqlalchemy as sa
+from flask import has_request_context, request
+from flask_sqlalchemy.session import Session
+
+READ_BIND = 'read'
+READ_METHODS = ('GET', 'HEAD')
+
+_ready_readers = set()
+
+
+def add_read_bind(app):
+    # Второй engine на тот же файл SQLite: только чтение, свой пул. В WAL читатели
+    # не блокируют писателя и не ждут его коммита.
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI')
+    if not uri or not app.config.get('READ_ENGINE_ENABLED', True):
+        return
+    url = sa.engine.make_url(uri)
+    if not url.drivername.startswith('sqlite') or url.database in (None, '', ':memory:'):
+        return
+    database = url.database if url.query.get('uri') else 'file:' + url.database
+    binds = app.config.setdefault('SQLALCHEMY_BINDS', {})
+    binds.setdefault(READ_BIND, {
+        'url': url.set(database=database).update_query_dict({'mode': 'ro', 'uri': 'true'}),
+        'pool_size': app.config.get('READ_ENGINE_POOL_SIZE', 10),
+    })
+
+
+def _query_only(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA query_only = ON')
+    cursor.close()
+
+
+def listen_read_engine(engine):
+    sa.event.listen(engine, 'connect', _query_only)
+
+
+def reader_ready(engine):
+    # mode=ro не создаёт файл базы: пока его не создал основной engine, читаем через него
+    if engine not in _ready_readers:
+        database = engine.url.database
+        if not os.path.exists(database[len('file:'):] if database.startswith('file:') else database):
+            return False
+        _ready_readers.add(engine)
+    return True
+
+
+class RoutingSession(Session):
+    # GET/HEAD читают через engine только для чтения, всё остальное — через основной.
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._use_reader(clause) and reader_ready(self._db.engines[READ_BIND]):
+            return self._db.engines[READ_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _use_reader(self, clause):
+        if not has_request_context() or request.method not in READ_METHODS:
+            return False
+        if self._flushing or isinstance(clause, sa.sql.expression.UpdateBase):
+            return False
+        return READ_BIND in self._db.engines
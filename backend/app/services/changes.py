@@ -0,0 +1,58 @@
+import sqlalchemy as sa
+from app import db
+from app.models.work_model import Work
+from app.models.change_model import ChangeLog
+
+works = Work.__table__
+change_log = ChangeLog.__table__
+
+
+def record(entity, op, ids):
+    if not ids:
+        return []
+    # sort_by_parameter_order в SQLite означает INSERT на каждую строку, поэтому версии
+    # сопоставляются с id по возвращённому entity_id
+    versions = dict(db.session.execute(
+        sa.insert(change_log).returning(change_log.c.entity_id, change_log.c.version),
+        [{'entity': entity, 'entity_id': entity_id, 'op': op} for entity_id in ids]
+    ).all())
+    return [versions[entity_id] for entity_id in ids]
+
+
+def record_works(op, items):
+    # items — экземпляры Work; им проставляется новая версия
+    versions = record('work', op, [work.id for work in items])
+    if op != 'deleted':
+        for work, version in zip(items, versions):
+            work.version = version
+    return versions
+
+
+def stamp_works(op, ids):
+    versions = record('work', op, ids)
+    if op != 'deleted' and ids:
+        db.session.execute(sa.update(works).where(works.c.id == sa.bindparam('work_id')).values(
+            version=sa.bindparam('work_version')
+        ), [{'work_id': work_id, 'work_version': version} for work_id, version in zip(ids, versions)])
+    return versions
+
+
+def current_version():
+    return db.session.scalar(sa.select(sa.func.coalesce(sa.func.max(change_log.c.version), 0)))
+
+
+def work_changes_since(since, rows_select):
+    version = current_version()
+    rows = list(db.session.execute(
+        rows_select.where(works.c.version > since, works.c.version <= version).order_by(works.c.version)
+    ))
+    live = {row.id for row in rows}
+    deleted = db.session.execute(
+        sa.select(change_log.c.entity_id).distinct().where(
+            change_log.c.entity == 'work',
+            change_log.c.op == 'deleted',
+            change_log.c.version > since,
+            change_log.c.version <= version
+        )
+    ).scalars().all()
+    return version, rows, [work_id for work_id in deleted if work_id not in live]
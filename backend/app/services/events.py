@@ -0,0 +1,177 @@
+import json
+import queue
+import threading
+import sqlalchemy as sa
+from app import application, db
+from app.models.change_model import ChangeLog
+from app.models.project_model import Project
+from app.services import changes, read_models
+from app.services.serializers import to_dict
+
+change_log = ChangeLog.__table__
+
+
+class Subscription:
+
+    def __init__(self, size):
+        self.queue = queue.Queue(maxsize=size)
+        self.lagging = False
+
+    def events(self, keepalive):
+        # None означает keep-alive; после переполнения очереди поток событий заканчивается
+        while True:
+            try:
+                yield self.queue.get(timeout=keepalive)
+            except queue.Empty:
+                if self.lagging:
+                    return
+                yield None
+
+
+class EventBroker:
+    # Один поток на процесс читает change_log и раздаёт события подписчикам,
+    # так что подписчик не держит ни сессию, ни соединение с БД.
+
+    def __init__(self, poll_interval=1.0, queue_size=1000):
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._last_version = None
+
+    def subscribe(self):
+        subscriber = Subscription(self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='event-broker', daemon=True)
+                self._thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def wake(self):
+        self._wakeup.set()
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(event)
+            except queue.Full:
+                # отставший клиент получит resync и догрузит данные через /works/changes
+                self._drop(subscriber)
+
+    def drop_all(self):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            self._drop(subscriber)
+
+    def _drop(self, subscriber):
+        subscriber.lagging = True
+        self.unsubscribe(subscriber)
+
+    def _run(self):
+        while True:
+            try:
+                with application.app_context():
+                    try:
+                        for event in self._poll():
+                            self.publish(event)
+                    finally:
+                        db.session.remove()
+            except Exception:
+                application.logger.exception('Event broker poll failed')
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _poll(self):
+        if self._last_version is None:
+            self._last_version = db.session.scalar(
+                sa.select(sa.func.coalesce(sa.func.max(change_log.c.version), 0))
+            )
+            return []
+
+        if missed_count(self._last_version) > self.queue_size:
+            # пакетная запись (импорт, генератор): очередь любого подписчика переполнилась бы,
+            # поэтому события не грузим, а сразу отправляем всех на resync
+            self._last_version = changes.current_version()
+            self.drop_all()
+            return []
+        self._last_version, events = events_since(self._last_version)
+        return events
+
+
+def events_since(version):
+    # (последняя прочитанная версия, события по записям change_log после version)
+    entries = db.session.execute(
+        sa.select(change_log.c.version, change_log.c.entity, change_log.c.entity_id, change_log.c.op)
+        .where(change_log.c.version > version)
+        .order_by(change_log.c.version)
+    ).all()
+    if not entries:
+        return version, []
+
+    work_ids = {e.entity_id for e in entries if e.entity == 'work' and e.op != 'deleted'}
+    project_ids = {e.entity_id for e in entries if e.entity == 'project' and e.op != 'deleted'}
+    work_rows = {}
+    if work_ids:
+        for row in db.session.execute(
+            read_models.works_select().where(read_models.works.c.id.in_(work_ids))
+        ):
+            work_rows[row.id] = read_models.work_row_to_dict(row)
+    project_rows = {}
+    if project_ids:
+        for project in read_models.projects_query().filter(Project.id.in_(project_ids)):
+            project_rows[project.id] = to_dict(project)
+
+    events = []
+    for entry in entries:
+        rows = work_rows if entry.entity == 'work' else project_rows
+        data = rows.get(entry.entity_id) if entry.op != 'deleted' else None
+        if entry.op != 'deleted' and data is None:
+            # строка уже удалена более поздней записью журнала
+            continue
+        events.append({
+            'version': entry.version,
+            'type': '{}.{}'.format(entry.entity, entry.op),
+            'id': entry.entity_id,
+            'data': data,
+        })
+    return entries[-1].version, events
+
+
+def missed_count(version):
+    return db.session.scalar(sa.select(sa.func.count()).where(change_log.c.version > version))
+
+
+def backlog(last_event_id, limit):
+    # Пропущенное переподключившимся клиентом (Last-Event-ID). None — если пропущено
+    # больше limit записей или версия не из этого журнала: тогда клиенту нужен resync.
+    if last_event_id > changes.current_version():
+        return None
+    if missed_count(last_event_id) > limit:
+        return None
+    return events_since(last_event_id)
+
+
+def format_event(event):
+    payload = json.dumps(event, ensure_ascii=False, separators=(',', ':'))
+    return 'id: {}\nevent: {}\ndata: {}\n\n'.format(event['version'], event['type'], payload)
+
+
+broker = EventBroker(
+    poll_interval=application.config.get('EVENTS_POLL_INTERVAL', 1.0),
+    queue_size=application.config.get('EVENTS_QUEUE_SIZE', 1000)
+)
+
+
+@sa.event.listens_for(db.session, 'after_commit')
+def _wake_broker(session):
+    broker.wake()
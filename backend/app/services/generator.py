@@ -0,0 +1,151 @@
+import random
+from datetime import date, timedelta
+import sqlalchemy as sa
+from app import db
+from app.models.project_model import Project
+from app.models.block_model import Block
+from app.models.floor_model import Floor
+from app.models.object_model import Object
+from app.models.work_model import Work
+from app.models.work_type_model import WorkType
+from app.models.executor_model import Executor
+from app.models.rollup_model import FloorRollup, BlockRollup, ProjectRollup
+from app.services import changes, work_writes
+
+WORK_TYPES = [
+    {"name": "Штукатурка", "order": 1, "color": "#e53e3e", "category": "Черновые работы"},
+    {"name": "Стяжка", "order": 2, "color": "#fd7900", "category": "Черновые работы"},
+    {"name": "Утеплитель", "order": 3, "color": "#fbb917", "category": "Черновые работы"},
+    {"name": "Шпаклёвка", "order": 4, "color": "#38a169", "category": "Отделочные работы"},
+    {"name": "Шпатлёвка", "order": 4, "color": "#38a169", "category": "Отделочные работы"},
+    {"name": "Плитка", "order": 5, "color": "#3182ce", "category": "Отделочные работы"},
+    {"name": "Сапожок", "order": 6, "color": "#805ad5", "category": "Отделочные работы"},
+    {"name": "ГКЛ", "order": 7, "color": "#9c88ff", "category": "Конструкции"},
+    {"name": "Армстронг", "order": 8, "color": "#48bb78", "category": "Потолки"},
+    {"name": "Грильято", "order": 9, "color": "#ed8936", "category": "Потолки"},
+    {"name": "Кварц винил", "order": 10, "color": "#38b2ac", "category": "Напольные покрытия"},
+    {"name": "Шкурка", "order": 11, "color": "#667eea", "category": "Отделочные работы"},
+    {"name": "Покраска", "order": 12, "color": "#e53e3e", "category": "Отделочные работы"},
+    {"name": "Покраска стен", "order": 13, "color": "#718096", "category": "Отделочные работы"},
+    {"name": "Сапожок (после дверников)", "order": 14, "color": "#4a5568", "category": "Отделочные работы"},
+    {"name": "Заделка штроб под радиатором", "order": 15, "color": "#2d3748", "category": "Специальные работы"},
+    {"name": "Дверные откосы внутри квартиры", "order": 16, "color": "#1a202c", "category": "Специальные работы"},
+    {"name": "Монтаж плитки на подоконники", "order": 17, "color": "#e53e3e", "category": "Специальные работы"},
+    {"name": "Монтаж плитки на лифтовые порталы", "order": 18, "color": "#718096", "category": "Специальные работы"},
+    {"name": "Монтаж табличек", "order": 19, "color": "#fd7900", "category": "Завершающие работы"},
+    {"name": "Уборка", "order": 20, "color": "#38a169", "category": "Завершающие работы"}
+]
+
+EXECUTORS = [
+    "СМР Майкоп", "СМР Гулькевичи", "СМР Кропоткин", "Бригада №1", "Бригада №2",
+    "Электрики", "Сантехники", "Отделочники", "Универсалы", "Подрядчик А", "Подрядчик Б"
+]
+
+OBJECT_NAMES = ["Квартиры", "МОП", "Лифт.холл", "Лест. м.", "Коммерция", "Электрощитовая", "ВНС"]
+
+
+def _object_name(n):
+    name = OBJECT_NAMES[n % len(OBJECT_NAMES)]
+    return name if n < len(OBJECT_NAMES) else f'{name} {n // len(OBJECT_NAMES) + 1}'
+
+
+def reset():
+    # Для стендов: без tombstone'ов в change_log, клиенты после генерации перезагружаются целиком.
+    for model in (Work, FloorRollup, BlockRollup, ProjectRollup, Floor, Block, Object, Project):
+        db.session.execute(sa.delete(model))
+    db.session.commit()
+
+
+def _reference_ids(model, rows):
+    table = model.__table__
+    existing = dict(db.session.execute(sa.select(table.c.name, table.c.id)).all())
+    missing = [row for row in rows if row['name'] not in existing]
+    for row, new_id in zip(missing, work_writes.insert_with_ids(table, missing)):
+        existing[row['name']] = new_id
+    return [existing[row['name']] for row in rows]
+
+
+def generate(projects=10, blocks=4, floors=10, works_per_floor=25, objects=5, seed=42,
+             base_date=None, prefix='gen', batch_size=10000, on_batch=None):
+    rng = random.Random(seed)
+    base_date = base_date or date.today()
+
+    work_type_ids = _reference_ids(WorkType, WORK_TYPES)
+    executor_ids = _reference_ids(Executor, [{'name': name} for name in EXECUTORS])
+
+    project_ids = work_writes.insert_with_ids(Project.__table__, [
+        {
+            'code': f'{prefix}-{n}',
+            'icon': '🏗️',
+            'name': f'Объект {prefix}-{n}',
+            'start_date': base_date - timedelta(days=180),
+            'end_date': base_date + timedelta(days=180),
+            'budget': rng.randint(100, 2000) * 1000000,
+        }
+        for n in range(1, projects + 1)
+    ])
+    object_rows = [
+        {'project_id': project_id, 'name': _object_name(n)}
+        for project_id in project_ids for n in range(objects)
+    ]
+    object_ids = work_writes.insert_with_ids(Object.__table__, object_rows)
+    objects_by_project = {}
+    for row, object_id in zip(object_rows, object_ids):
+        objects_by_project.setdefault(row['project_id'], []).append(object_id)
+
+    block_rows = [
+        {'project_id': project_id, 'name': f'Б-{n}'}
+        for project_id in project_ids for n in range(1, blocks + 1)
+    ]
+    block_ids = work_writes.insert_with_ids(Block.__table__, block_rows)
+    floor_rows = [
+        {'block_id': block_id, 'number': str(n)}
+        for block_id in block_ids for n in range(1, floors + 1)
+    ]
+    floor_ids = work_writes.insert_with_ids(Floor.__table__, floor_rows)
+    block_projects = {block_id: row['project_id'] for row, block_id in zip(block_rows, block_ids)}
+
+    changes.record('project', 'created', project_ids)
+
+    total = 0
+    batch = []
+    for row, floor_id in zip(floor_rows, floor_ids):
+        project_objects = objects_by_project.get(block_projects[row['block_id']])
+        if not project_objects:
+            continue
+        for _ in range(works_per_floor):
+            start_date = base_date - timedelta(days=rng.randint(0, 60))
+            end_date = start_date + timedelta(days=rng.randint(3, 14))
+            progress = rng.randint(0, 100)
+            if progress == 100:
+                status = 'completed'
+            elif end_date < base_date:
+                status = 'overdue'
+            else:
+                status = 'in-progress' if progress else 'not-started'
+            batch.append({
+                'executor_id': rng.choice(executor_ids),
+                'work_type_id': rng.choice(work_type_ids),
+                'start_date': start_date,
+                'end_date': end_date,
+                'status': status,
+                'priority': rng.randint(1, 5),
+                'progress': progress,
+                'note': None,
+                'floor_id': floor_id,
+                'object_id': rng.choice(project_objects),
+            })
+            if len(batch) >= batch_size:
+                work_writes.insert_works(batch)
+                total += len(batch)
+                batch = []
+                if on_batch:
+                    on_batch(total)
+    if batch:
+        work_writes.insert_works(batch)
+        total += len(batch)
+        if on_batch:
+            on_batch(total)
+
+    db.session.commit()
+    return {'projects': len(project_ids), 'blocks': len(block_ids), 'floors': len(floor_ids), 'works': total}
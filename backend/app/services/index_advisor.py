@@ -0,0 +1,211 @@
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import uuid
+from datetime import datetime
+import sqlalchemy as sa
+from app import db
+from app.services import query_log
+
+TABLE = 'works'
+
+# составные и покрывающие индексы под фильтры, сортировки и агрегаты по works
+CANDIDATES = (
+    ('status',),
+    ('status', 'end_date'),
+    ('status', 'progress'),
+    ('end_date', 'status'),
+    ('end_date', 'progress'),
+    ('floor_id', 'status'),
+    ('floor_id', 'status', 'progress'),
+    ('work_type_id', 'status'),
+    ('executor_id', 'status'),
+)
+
+
+def index_name(columns, table=TABLE):
+    return 'ix_{}_{}'.format(table, '_'.join(columns))
+
+
+def load_workload(path):
+    # одинаковые после нормализации запросы склеиваются, параметры берутся из первого
+    statements = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            key = query_log.normalize(entry['statement'])
+            if key in statements:
+                statements[key]['count'] += 1
+            else:
+                statements[key] = {
+                    'statement': entry['statement'],
+                    'parameters': entry.get('parameters') or [],
+                    'count': 1,
+                }
+    return list(statements.values())
+
+
+def _existing_indexes(connection, table=TABLE):
+    indexes = set()
+    for _, name, *_ in connection.execute('PRAGMA index_list({})'.format(table)).fetchall():
+        columns = tuple(row[2] for row in connection.execute('PRAGMA index_info({})'.format(name)))
+        indexes.add(columns)
+    return indexes
+
+
+class Advisor:
+    # Работает на копии базы: индексы создаются и удаляются там, рабочий файл не трогается.
+
+    def __init__(self, workload, repeat=3):
+        self.workload = workload
+        self.repeat = repeat
+        self._directory = tempfile.TemporaryDirectory(prefix='index-advice-')
+        self.path = os.path.join(self._directory.name, 'advice.db')
+        self._engine = None
+        self.connection = None
+
+    def __enter__(self):
+        source = sqlite3.connect(db.engine.url.database)
+        target = sqlite3.connect(self.path)
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+        # через engine, чтобы на соединении были casefold() и прагмы приложения
+        self._engine = sa.create_engine('sqlite:///' + self.path, poolclass=sa.pool.NullPool)
+        self.connection = self._engine.raw_connection()
+        self.connection.execute('ANALYZE')
+        return self
+
+    def __exit__(self, *exc):
+        self.connection.close()
+        self._engine.dispose()
+        self._directory.cleanup()
+
+    def plan(self, entry):
+        return [row[3] for row in self.connection.execute(
+            'EXPLAIN QUERY PLAN ' + entry['statement'], entry['parameters']
+        ).fetchall()]
+
+    def timing(self, entry):
+        best = None
+        for _ in range(self.repeat):
+            started = time.perf_counter()
+            self.connection.execute(entry['statement'], entry['parameters']).fetchall()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def measure(self):
+        return [{'plan': self.plan(entry), 'seconds': self.timing(entry)} for entry in self.workload]
+
+    def total(self, results):
+        return sum(entry['count'] * result['seconds'] for entry, result in zip(self.workload, results))
+
+    def create(self, columns):
+        self.connection.execute('CREATE INDEX {} ON {} ({})'.format(index_name(columns), TABLE, ', '.join(columns)))
+        self.connection.execute('ANALYZE {}'.format(index_name(columns)))
+
+    def drop(self, columns):
+        self.connection.execute('DROP INDEX {}'.format(index_name(columns)))
+
+    def advise(self, candidates=CANDIDATES, min_gain=5.0, on_round=None):
+        # жадный подбор: на каждом круге берём лучший кандидат поверх уже выбранных
+        existing = _existing_indexes(self.connection)
+        remaining = [c for c in candidates if not any(index[:len(c)] == c for index in existing)]
+        baseline = self.measure()
+        current = baseline
+        chosen = []
+        while remaining:
+            scores = []
+            for columns in remaining:
+                self.create(columns)
+                try:
+                    results = self.measure()
+                finally:
+                    self.drop(columns)
+                # индекс, не попавший ни в один план, ничего не даёт — разница во времени это шум
+                used = any(before['plan'] != after['plan'] for before, after in zip(current, results))
+                gain = self.total(current) - self.total(results) if used else 0.0
+                scores.append((gain, columns, results))
+            scores.sort(key=lambda score: score[0], reverse=True)
+            if on_round:
+                on_round(self.total(current), scores)
+            gain, columns, results = scores[0]
+            if gain <= 0 or gain / self.total(current) * 100 < min_gain:
+                break
+            self.create(columns)
+            chosen.append({
+                'columns': columns,
+                'gain': gain,
+                'changed': [
+                    (entry, before['plan'], after['plan'])
+                    for entry, before, after in zip(self.workload, current, results)
+                    if before['plan'] != after['plan']
+                ],
+            })
+            current = results
+            remaining.remove(columns)
+        return {'baseline': self.total(baseline), 'final': self.total(current), 'chosen': chosen}
+
+
+MIGRATION_TEMPLATE = '''"""{message}
+
+Revision ID: {revision}
+Revises: {down_revision}
+Create Date: {create_date}
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '{revision}'
+down_revision = '{down_revision}'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('{table}', schema=None) as batch_op:
+{create}
+
+
+def downgrade():
+    with op.batch_alter_table('{table}', schema=None) as batch_op:
+{drop}
+'''
+
+
+def write_migration(directory, column_sets, message='index advice'):
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    config = Config(os.path.join(directory, 'alembic.ini'))
+    config.set_main_option('script_location', directory)
+    head = ScriptDirectory.from_config(config).get_current_head()
+    revision = uuid.uuid4().hex[-12:]
+    path = os.path.join(directory, 'versions', '{}_{}.py'.format(revision, message.replace(' ', '_')))
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(MIGRATION_TEMPLATE.format(
+            message=message,
+            revision=revision,
+            down_revision=head,
+            create_date=datetime.now(),
+            table=TABLE,
+            create='\n'.join(
+                "        batch_op.create_index('{}', {!r}, unique=False)".format(index_name(c), list(c))
+                for c in column_sets
+            ),
+            drop='\n'.join(
+                "        batch_op.drop_index('{}')".format(index_name(c)) for c in reversed(column_sets)
+            ),
+        ))
+    return path
@@ -0,0 +1,106 @@
+import base64
+import json
+from datetime import date
+import sqlalchemy as sa
+from app import db
+
+
+def encode_cursor(values, direction):
+    payload = [value.isoformat() if isinstance(value, date) else value for value in values]
+    raw = json.dumps({'v': payload, 'd': direction}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, keys):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        values, direction = payload['v'], payload['d']
+        if direction not in ('next', 'prev') or not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError(direction)
+
+        decoded = []
+        for (expression, _), value in zip(keys, values):
+            if value is not None and not isinstance(value, (str, int, float)):
+                raise TypeError(value)
+            if value is not None and isinstance(expression.type, sa.Date):
+                value = date.fromisoformat(value)
+            decoded.append(value)
+    except (ValueError, TypeError, KeyError):
+        # подробности не отдаём: курсор непрозрачен для клиента
+        raise ValueError('Invalid cursor')
+    return decoded, direction
+
+
+def _base_table(statement):
+    from_ = statement.get_final_froms()[0]
+    while isinstance(from_, sa.Join):
+        from_ = from_.left
+    return from_
+
+
+def _nullable(expression, table):
+    # NOT NULL надёжен только у колонок основной таблицы: внешнее соединение даёт NULL и в них
+    column = expression.expression
+    return not (isinstance(column, sa.Column) and column.table is table and not column.nullable)
+
+
+def _equal(expression, value):
+    return expression.is_(None) if value is None else expression == value
+
+
+def _step(expression, value, descending, nullable):
+    # в SQLite NULL меньше любого значения: первый при возрастании, последний при убывании
+    if value is None:
+        return sa.false() if descending else expression.is_not(None)
+    step = expression < value if descending else expression > value
+    # OR IS NULL лишает SQLite диапазона по индексу, поэтому только там, где NULL возможен
+    return sa.or_(step, expression.is_(None)) if descending and nullable else step
+
+
+def _after(keys, values, nullable):
+    directions = {descending for _, descending in keys}
+    if len(directions) == 1 and not any(nullable) and None not in values:
+        left = sa.tuple_(*(expression for expression, _ in keys))
+        right = sa.tuple_(*values)
+        return left < right if directions.pop() else left > right
+
+    clauses = []
+    for index, (expression, descending) in enumerate(keys):
+        equal = [_equal(keys[i][0], values[i]) for i in range(index)]
+        clauses.append(sa.and_(*equal, _step(expression, values[index], descending, nullable[index])))
+    return sa.or_(*clauses)
+
+
+def paginate(statement, keys, limit, cursor=None):
+    values, direction = decode_cursor(cursor, keys) if cursor else (None, 'next')
+    backward = direction == 'prev'
+    scan_keys = tuple((expression, descending != backward) for expression, descending in keys)
+
+    statement = statement.add_columns(
+        *(expression.label('_key_{}'.format(index)) for index, (expression, _) in enumerate(keys))
+    )
+    if values is not None:
+        table = _base_table(statement)
+        nullable = [_nullable(expression, table) for expression, _ in keys]
+        statement = statement.where(_after(scan_keys, values, nullable))
+    statement = statement.order_by(None).order_by(
+        *(expression.desc() if descending else expression for expression, descending in scan_keys)
+    ).limit(limit + 1)
+
+    rows = db.session.execute(statement).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backward:
+        rows.reverse()
+
+    def key_of(row):
+        return tuple(row[-len(keys):])
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if has_more or backward:
+            next_cursor = encode_cursor(key_of(rows[-1]), 'next')
+        if (has_more and backward) or (values is not None and not backward):
+            prev_cursor = encode_cursor(key_of(rows[0]), 'prev')
+    return rows, next_cursor, prev_cursor
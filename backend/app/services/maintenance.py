@@ -0,0 +1,272 @@
+import json
+import os
+import threading
+import time
+from flask import g
+from app import application, db
+from app.services import metrics
+from app.services.storage import checkpointer, is_busy
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: без Passenger процесс один, он и ведущий
+    fcntl = None
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+metrics.register('db_maintenance_runs_total', 'counter', 'Maintenance tasks run by the leader worker, by result.')
+metrics.register('db_maintenance_seconds_total', 'counter', 'Time spent in maintenance tasks.')
+metrics.register('db_vacuum_pages_reclaimed_total', 'counter', 'Free pages returned to the file system.')
+metrics.register('db_file_bytes', 'gauge', 'Database file size after the last maintenance task.')
+metrics.register('db_freelist_pages', 'gauge', 'Free pages in the database after the last maintenance task.')
+
+
+def _pragma(connection, name):
+    return connection.exec_driver_sql('PRAGMA {}'.format(name)).scalar()
+
+
+def optimize():
+    with db.engine.connect() as connection:
+        connection.exec_driver_sql('PRAGMA optimize')
+    return 0
+
+
+def analyze():
+    with db.engine.connect() as connection:
+        connection.exec_driver_sql('ANALYZE')
+    return 0
+
+
+def incremental_vacuum_enabled():
+    with db.engine.connect() as connection:
+        return _pragma(connection, 'auto_vacuum') == AUTO_VACUUM_INCREMENTAL
+
+
+def incremental_vacuum():
+    min_pages = application.config.get('MAINTENANCE_VACUUM_MIN_PAGES', 256)
+    max_pages = application.config.get('MAINTENANCE_VACUUM_PAGES', 5000)
+    with db.engine.connect() as connection:
+        if _pragma(connection, 'auto_vacuum') != AUTO_VACUUM_INCREMENTAL:
+            return 0
+        before = _pragma(connection, 'freelist_count')
+        if before < min_pages:
+            return 0
+        # execute() в sqlite3 делает один шаг, а это одна страница; executescript доводит до конца
+        connection.connection.dbapi_connection.executescript('PRAGMA incremental_vacuum({})'.format(max_pages))
+        return before - _pragma(connection, 'freelist_count')
+
+
+def checkpoint():
+    # в тишине WAL можно не только сбросить, но и обрезать до нуля
+    busy, _, _ = checkpointer.checkpoint('TRUNCATE')
+    if busy:
+        raise TimeoutError('WAL checkpoint is blocked by readers')
+    return 0
+
+
+def vacuum():
+    # полный VACUUM переписывает файл и включает auto_vacuum у базы, созданной без него
+    with db.engine.connect() as connection:
+        before = _pragma(connection, 'page_count')
+        connection.exec_driver_sql('PRAGMA auto_vacuum = INCREMENTAL')
+        connection.exec_driver_sql('VACUUM')
+        return before - _pragma(connection, 'page_count')
+
+
+# имя → (функция, ключ интервала в конфиге, интервал по умолчанию, секунды)
+TASKS = {
+    'optimize': (optimize, 'MAINTENANCE_OPTIMIZE_INTERVAL', 3600),
+    'analyze': (analyze, 'MAINTENANCE_ANALYZE_INTERVAL', 24 * 3600),
+    'incremental_vacuum': (incremental_vacuum, 'MAINTENANCE_VACUUM_INTERVAL', 3600),
+    'checkpoint': (checkpoint, 'MAINTENANCE_CHECKPOINT_INTERVAL', 600),
+}
+
+
+def database_stats():
+    with db.engine.connect() as connection:
+        page_size = _pragma(connection, 'page_size')
+        return {
+            'file_bytes': _pragma(connection, 'page_count') * page_size,
+            'freelist_pages': _pragma(connection, 'freelist_count'),
+        }
+
+
+def run_task(name, function=None):
+    function = function or TASKS[name][0]
+    labels = (('task', name),)
+    started = time.perf_counter()
+    result, reclaimed = 'ok', 0
+    try:
+        reclaimed = function()
+    except Exception as e:
+        if not isinstance(e, TimeoutError) and not is_busy(e):
+            result = 'error'
+            raise
+        result = 'busy'
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.store.inc('db_maintenance_seconds_total', labels, elapsed)
+        metrics.store.inc('db_maintenance_runs_total', labels + (('result', result),))
+    if reclaimed:
+        metrics.store.inc('db_vacuum_pages_reclaimed_total', labels, reclaimed)
+    stats = database_stats()
+    metrics.store.set('db_file_bytes', (), stats['file_bytes'])
+    metrics.store.set('db_freelist_pages', (), stats['freelist_pages'])
+    metrics.store.flush(force=True)
+    application.logger.info('Maintenance %s: %s in %.1f ms, %d pages reclaimed, %d bytes',
+                            name, result, elapsed * 1000, reclaimed, stats['file_bytes'])
+    return {'task': name, 'result': result, 'seconds': elapsed, 'reclaimed': reclaimed, **stats}
+
+
+class Scheduler:
+    # Задачи выполняет один воркер Passenger — тот, кто держит flock на lock-файле;
+    # если он умирает, блокировку освобождает ОС и её забирает следующий. Остальные
+    # воркеры только отмечают запросы, трогая файл активности: задачи ждут, пока
+    # его mtime не станет старше MAINTENANCE_QUIET_PERIOD.
+
+    TOUCH_INTERVAL = 1.0
+
+    def __init__(self, directory, tick=10):
+        self.directory = directory
+        self.tick = tick
+        self._lock = threading.Lock()
+        self._thread = None
+        self._lock_file = None
+        self._in_flight = 0
+        self._touched_at = 0.0
+        self._started_at = time.time()
+
+    @property
+    def lock_path(self):
+        return os.path.join(self.directory, 'maintenance.lock')
+
+    @property
+    def activity_path(self):
+        return os.path.join(self.directory, 'maintenance.activity')
+
+    def request_started(self):
+        with self._lock:
+            self._in_flight += 1
+        self._touch()
+
+    def request_finished(self):
+        with self._lock:
+            self._in_flight -= 1
+        self._touch()
+
+    def _touch(self):
+        now = time.monotonic()
+        if now - self._touched_at < self.TOUCH_INTERVAL:
+            return
+        self._touched_at = now
+        try:
+            os.utime(self.activity_path)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(self.activity_path), exist_ok=True)
+            open(self.activity_path, 'a').close()
+
+    def quiet(self):
+        if self._in_flight:
+            return False
+        try:
+            idle = time.time() - os.stat(self.activity_path).st_mtime
+        except FileNotFoundError:
+            return True
+        return idle >= application.config.get('MAINTENANCE_QUIET_PERIOD', 30)
+
+    def is_leader(self):
+        if self._lock_file is not None:
+            return True
+        os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+        lock_file = open(self.lock_path, 'a+', encoding='utf-8')
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                return False
+        # файл остаётся открытым до конца процесса: закрытие сняло бы блокировку
+        self._lock_file = lock_file
+        return True
+
+    def _last_runs(self):
+        # время прошлых запусков хранится в lock-файле, чтобы новый ведущий не начинал с нуля
+        self._lock_file.seek(0)
+        try:
+            return json.loads(self._lock_file.read() or '{}')
+        except ValueError:
+            return {}
+
+    def _save_last_runs(self, last_runs):
+        self._lock_file.seek(0)
+        self._lock_file.truncate()
+        json.dump(last_runs, self._lock_file)
+        self._lock_file.flush()
+
+    def due(self):
+        now = time.time()
+        max_delay = application.config.get('MAINTENANCE_MAX_DELAY', 6 * 3600)
+        quiet = self.quiet()
+        last_runs = self._last_runs()
+        tasks = []
+        for name, (_, setting, default) in TASKS.items():
+            interval = application.config.get(setting, default)
+            if not interval:
+                continue
+            last_run = last_runs.get(name)
+            # ни разу не выполнявшаяся задача просрочена с запуска планировщика
+            overdue = now - last_run - interval if last_run is not None else now - self._started_at
+            # под непрерывной нагрузкой тишины может не быть вовсе
+            if overdue >= 0 and (quiet or overdue >= max_delay):
+                tasks.append(name)
+        return tasks
+
+    def run_due(self):
+        if not self.is_leader():
+            return []
+        results = []
+        for name in self.due():
+            result = run_task(name)
+            results.append(result)
+            if result['result'] == 'ok':
+                self._save_last_runs({**self._last_runs(), name: time.time()})
+        return results
+
+    def start(self):
+        if not application.config.get('MAINTENANCE_ENABLED', True) or db.engine.dialect.name != 'sqlite':
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._started_at = time.time()
+                self._thread = threading.Thread(target=self._run, name='db-maintenance', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.tick)
+            try:
+                with application.app_context():
+                    self.run_due()
+            except Exception:
+                application.logger.exception('Database maintenance failed')
+
+
+scheduler = Scheduler(
+    application.config.get('MAINTENANCE_DIR') or application.instance_path,
+    tick=application.config.get('MAINTENANCE_TICK', 10)
+)
+
+
+@application.before_request
+def _mark_request():
+    # поток запускается после fork воркера, при первом запросе
+    scheduler.start()
+    scheduler.request_started()
+    g.maintenance_marked = True
+
+
+@application.teardown_request
+def _unmark_request(exc):
+    if g.pop('maintenance_marked', False):
+        scheduler.request_finished()
@@ -0,0 +1,244 @@
+import atexit
+import json
+import os
+import threading
+import time
+from app import application
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: без Passenger процесс один, делить файлы не с кем
+    fcntl = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+# имя → (тип, описание, границы корзин для гистограмм)
+METRICS = {
+    'http_requests_total': ('counter', 'Finished HTTP requests.', None),
+    'http_request_duration_seconds': ('histogram', 'HTTP request latency, including streamed bodies.', LATENCY_BUCKETS),
+    'http_response_size_bytes': ('histogram', 'HTTP response body size.', SIZE_BUCKETS),
+    'http_requests_in_flight': ('gauge', 'HTTP requests currently being served.', None),
+}
+
+
+def register(name, kind, description, buckets=None):
+    METRICS[name] = (kind, description, buckets)
+
+
+class Store:
+    # Метрики одного процесса; в общий каталог каждый процесс пишет свой
+    # <pid>-<время старта>.json, /api/metrics складывает файлы всех воркеров Passenger.
+    # Время старта в имени не даёт воркеру с повторно выданным pid затереть чужие счётчики.
+
+    def __init__(self, directory, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._values = {}
+        self._histograms = {}
+        self._flushed_at = 0.0
+        self._pid = None
+        self._path = None
+
+    def inc(self, name, labels=(), value=1):
+        key = (name, tuple(labels))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def set(self, name, labels, value):
+        with self._lock:
+            self._values[(name, tuple(labels))] = value
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = (name, tuple(labels))
+        with self._lock:
+            counts, total = self._histograms.get(key) or ([0] * (len(buckets) + 1), 0)
+            index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+            counts[index] += 1
+            self._histograms[key] = (counts, total + value)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'values': [[name, [list(l) for l in labels], value] for (name, labels), value in self._values.items()],
+                'histograms': [
+                    [name, [list(l) for l in labels], list(counts), total]
+                    for (name, labels), (counts, total) in self._histograms.items()
+                ],
+            }
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._flushed_at < self.flush_interval:
+            return
+        self._flushed_at = now
+        os.makedirs(self.directory, exist_ok=True)
+        if self._pid != os.getpid():
+            # первый сброс после старта или fork воркера
+            self._pid = os.getpid()
+            self._path = os.path.join(self.directory, '{}-{}.json'.format(self._pid, time.time_ns()))
+            prune(self.directory)
+        tmp_path = self._path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, self._path)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+DEAD_FILE = 'dead.json'
+
+
+class _DirectoryLock:
+    # collect читает каталог под разделяемой блокировкой, prune переносит файлы под
+    # исключительной: иначе файл умершего воркера можно сложить дважды или ни разу
+
+    def __init__(self, directory, exclusive):
+        self.path = os.path.join(directory, 'metrics.lock')
+        self.exclusive = exclusive
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, 'a')
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_EX if self.exclusive else fcntl.LOCK_SH)
+        return self
+
+    def __exit__(self, *exc):
+        self._file.close()
+
+
+def _read(directory):
+    for filename in os.listdir(directory):
+        if not filename.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, filename), encoding='utf-8') as f:
+                yield filename, json.load(f)
+        except (OSError, ValueError):
+            continue
+
+
+def _merge(values, histograms, data, gauges=True):
+    for name, labels, value in data['values']:
+        if name not in METRICS or (METRICS[name][0] == 'gauge' and not gauges):
+            continue
+        key = (name, tuple(tuple(l) for l in labels))
+        values[key] = values.get(key, 0) + value
+    for name, labels, counts, total in data['histograms']:
+        if name not in METRICS:
+            continue
+        key = (name, tuple(tuple(l) for l in labels))
+        merged, merged_total = histograms.get(key) or ([0] * len(counts), 0)
+        histograms[key] = ([a + b for a, b in zip(merged, counts)], merged_total + total)
+
+
+def _dump(values, histograms):
+    return {
+        'pid': None,
+        'values': [[name, [list(l) for l in labels], value] for (name, labels), value in values.items()],
+        'histograms': [
+            [name, [list(l) for l in labels], list(counts), total]
+            for (name, labels), (counts, total) in histograms.items()
+        ],
+    }
+
+
+def prune(directory):
+    # Файлы умерших воркеров складываются в dead.json и удаляются: каталог не растёт
+    # с каждым перезапуском, а сумма счётчиков не уменьшается.
+    with _DirectoryLock(directory, exclusive=True):
+        dead = []
+        values, histograms = {}, {}
+        for filename, data in _read(directory):
+            if filename == DEAD_FILE:
+                _merge(values, histograms, data, gauges=False)
+            elif not _alive(data['pid']):
+                _merge(values, histograms, data, gauges=False)
+                dead.append(filename)
+        if not dead:
+            return
+        path = os.path.join(directory, DEAD_FILE)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(_dump(values, histograms), f)
+        os.replace(path + '.tmp', path)
+        for filename in dead:
+            os.remove(os.path.join(directory, filename))
+
+
+def collect(directory):
+    values = {}
+    histograms = {}
+    if not os.path.isdir(directory):
+        return values, histograms
+    with _DirectoryLock(directory, exclusive=False):
+        for filename, data in _read(directory):
+            # счётчики умерших воркеров остаются в сумме, их gauge'и — нет
+            _merge(values, histograms, data, gauges=data['pid'] is not None and _alive(data['pid']))
+    return values, histograms
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(k, _escape(v)) for k, v in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(values, histograms):
+    lines = []
+    for name, (kind, description, buckets) in sorted(METRICS.items()):
+        if kind == 'histogram':
+            series = sorted((labels, data) for (n, labels), data in histograms.items() if n == name)
+        else:
+            series = sorted((labels, value) for (n, labels), value in values.items() if n == name)
+        if not series:
+            continue
+        lines.append('# HELP {} {}'.format(name, description))
+        lines.append('# TYPE {} {}'.format(name, kind))
+        for labels, data in series:
+            if kind != 'histogram':
+                lines.append('{}{} {}'.format(name, _labels(labels), _number(data)))
+                continue
+            counts, total = data
+            cumulative = 0
+            for bound, count in zip(buckets + (float('inf'),), counts):
+                cumulative += count
+                lines.append('{}_bucket{} {}'.format(name, _labels(labels, [('le', _number(bound))]), cumulative))
+            lines.append('{}_sum{} {}'.format(name, _labels(labels), _number(total)))
+            lines.append('{}_count{} {}'.format(name, _labels(labels), cumulative))
+    return '\n'.join(lines) + '\n'
+
+
+def exposition():
+    store.flush(force=True)
+    return render(*collect(store.directory))
+
+
+store = Store(
+    application.config.get('METRICS_DIR') or os.path.join(application.instance_path, 'metrics'),
+    flush_interval=application.config.get('METRICS_FLUSH_INTERVAL', 1.0)
+)
+atexit.register(store.flush, force=True)
@@ -0,0 +1,88 @@
+from collections import defaultdict
+import sqlalchemy as sa
+from app import db
+from app.models.block_model import Block
+from app.models.floor_model import Floor
+from app.models.object_model import Object
+from app.models.work_model import Work
+from app.services import work_writes
+
+blocks = Block.__table__
+floors = Floor.__table__
+objects = Object.__table__
+
+
+def _delete(table, ids):
+    if ids:
+        db.session.execute(sa.delete(table).where(table.c.id.in_(ids)))
+
+
+def sync(project_id, blocks_data, object_names):
+    # Дерево проекта приводится к присланному одним чтением и пакетными DELETE/INSERT,
+    # без загрузки блоков и этажей в сессию.
+    block_names = {}
+    block_floors = defaultdict(list)
+    for block_id, block_name, floor_id, floor_number in db.session.execute(
+        sa.select(blocks.c.id, blocks.c.name, floors.c.id, floors.c.number)
+        .select_from(blocks.outerjoin(floors, floors.c.block_id == blocks.c.id))
+        .where(blocks.c.project_id == project_id)
+        .order_by(blocks.c.id)
+    ):
+        block_names[block_id] = block_name
+        if floor_id is not None:
+            block_floors[block_id].append((floor_number, floor_id))
+    # при одинаковых именах этажи сверяются с первым блоком
+    block_ids = {}
+    for block_id, name in block_names.items():
+        block_ids.setdefault(name, block_id)
+
+    wanted = {}
+    for block_data in blocks_data:
+        floor_numbers = wanted.setdefault(block_data['name'], {})
+        floor_numbers.update(dict.fromkeys(str(number) for number in block_data.get('floors', [])))
+
+    removed_block_ids = [block_id for block_id, name in block_names.items() if name not in wanted]
+    removed_floor_ids = [
+        floor_id
+        for block_id, name in block_names.items()
+        for number, floor_id in block_floors[block_id]
+        if name not in wanted or (block_ids[name] == block_id and number not in wanted[name])
+    ]
+
+    existing_objects = db.session.execute(
+        sa.select(objects.c.id, objects.c.name).where(objects.c.project_id == project_id)
+    ).all()
+    object_names = dict.fromkeys(str(name) for name in object_names)
+    removed_object_ids = [object_id for object_id, name in existing_objects if name not in object_names]
+
+    work_writes.delete_works(sa.or_(
+        Work.floor_id.in_(removed_floor_ids),
+        Work.object_id.in_(removed_object_ids)
+    ))
+    _delete(floors, removed_floor_ids)
+    _delete(blocks, removed_block_ids)
+    _delete(objects, removed_object_ids)
+
+    new_block_names = [name for name in wanted if name not in block_ids]
+    if new_block_names:
+        # имена новых блоков различны, так что id сопоставляются по имени и порядок строк не важен
+        block_ids.update(db.session.execute(
+            sa.insert(blocks).returning(blocks.c.name, blocks.c.id),
+            [{'name': name, 'project_id': project_id} for name in new_block_names]
+        ).all())
+
+    floor_rows = []
+    for name, floor_numbers in wanted.items():
+        block_id = block_ids[name]
+        # id удалённого блока SQLite может выдать новому, поэтому его этажи не смотрим
+        existing = set() if name in new_block_names else {number for number, _ in block_floors[block_id]}
+        floor_rows.extend(
+            {'number': number, 'block_id': block_id} for number in floor_numbers if number not in existing
+        )
+    if floor_rows:
+        db.session.execute(sa.insert(floors), floor_rows)
+
+    kept_objects = {name for _, name in existing_objects}
+    object_rows = [{'name': name, 'project_id': project_id} for name in object_names if name not in kept_objects]
+    if object_rows:
+        db.session.execute(sa.insert(objects), object_rows)
@@ -0,0 +1,177 @@
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+from logging.handlers import RotatingFileHandler
+import sqlalchemy as sa
+from flask import g, has_request_context, request
+from app import application
+from app.services import metrics
+
+_WHITESPACE = re.compile(r'\s+')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_NUMBER = re.compile(r'\b\d+\b')
+_SELECT = re.compile(r'\s*(SELECT|WITH)\b', re.IGNORECASE)
+
+metrics.register('http_request_db_queries', 'histogram', 'SQL statements executed per request.',
+                 (1, 2, 5, 10, 20, 50, 100, 500))
+metrics.register('http_request_db_seconds', 'histogram', 'Time spent in SQL per request.',
+                 metrics.LATENCY_BUCKETS)
+metrics.register('http_request_repeated_queries_total', 'counter',
+                 'Requests that ran one normalised statement more than QUERY_REPEAT_THRESHOLD times.')
+metrics.register('db_slow_queries_total', 'counter', 'Statements slower than SLOW_QUERY_THRESHOLD.')
+
+slow_logger = logging.getLogger('app.slow_queries')
+slow_logger.propagate = False
+
+_capture_lock = threading.Lock()
+_capture_file = None
+
+
+def normalize(statement):
+    # IN (?, ?, ?) с разным числом параметров — один и тот же запрос
+    statement = _WHITESPACE.sub(' ', statement).strip()
+    return _NUMBER.sub('N', _PLACEHOLDER_LIST.sub('(?)', statement))
+
+
+class RequestQueries:
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def add(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        self.statements[normalize(statement)] += 1
+
+    def repeated(self, threshold):
+        return [(statement, n) for statement, n in self.statements.most_common() if n > threshold]
+
+    def server_timing(self):
+        return 'db;dur={:.2f};desc="{} queries"'.format(self.duration * 1000, self.count)
+
+
+def current():
+    return g.get('queries') if has_request_context() else None
+
+
+def start():
+    g.queries = RequestQueries()
+    return g.queries
+
+
+def report(queries, method, path, route, status):
+    labels = (('method', method), ('route', route))
+    metrics.store.observe('http_request_db_queries', labels, queries.count)
+    metrics.store.observe('http_request_db_seconds', labels, queries.duration)
+
+    # строка на каждый запрос вытесняла бы ошибки из backand.log: пишем только медленные
+    # по БД и с возможным N+1, остальное видно в метриках и заголовке Server-Timing
+    repeated = queries.repeated(application.config.get('QUERY_REPEAT_THRESHOLD', 10))
+    threshold = application.config.get('SLOW_QUERY_THRESHOLD', 0.2)
+    if repeated or (threshold is not None and queries.duration >= threshold):
+        application.logger.warning('%s %s %s: %d queries, %.1f ms in DB',
+                                   method, path, status, queries.count, queries.duration * 1000)
+    if repeated:
+        metrics.store.inc('http_request_repeated_queries_total', labels)
+        for statement, n in repeated:
+            application.logger.warning('Possible N+1 in %s %s: statement ran %d times: %s',
+                                       method, path, n, statement)
+
+
+def _slow_log():
+    if not slow_logger.handlers:
+        path = application.config.get('SLOW_QUERY_LOG', 'logs/slow_queries.log')
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        handler = RotatingFileHandler(path, maxBytes=1024 * 1024, backupCount=5, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        slow_logger.addHandler(handler)
+        slow_logger.setLevel(logging.INFO)
+    return slow_logger
+
+
+def query_plan(dbapi_connection, statement, parameters):
+    # отдельный курсор: у исходного ещё не выбраны строки результата
+    cursor = dbapi_connection.cursor()
+    try:
+        rows = cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+    finally:
+        cursor.close()
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append('  ' * depth[node_id] + detail)
+    return lines
+
+
+def log_slow_query(conn, statement, parameters, executemany, elapsed):
+    route = path = '-'
+    if has_request_context():
+        route = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+        path = '{} {}'.format(request.method, request.full_path.rstrip('?'))
+    metrics.store.inc('db_slow_queries_total', (('route', route),))
+    plan = ()
+    if conn.dialect.name == 'sqlite' and not executemany:
+        try:
+            plan = query_plan(conn.connection.dbapi_connection, statement, parameters)
+        except Exception as e:
+            plan = ('EXPLAIN QUERY PLAN failed: {}'.format(e),)
+    params = repr(parameters)
+    _slow_log().info('%.1f ms %s (%s)\n%s\nparams: %s\nplan:\n%s\n',
+                     elapsed * 1000, path, route, statement.strip(),
+                     params if len(params) <= 1000 else params[:1000] + '...',
+                     '\n'.join('  ' + line for line in plan) or '  -')
+
+
+def capture(path, statement, parameters, elapsed):
+    # нагрузка для flask db-commands index-advice: по строке NDJSON на SELECT
+    global _capture_file
+    if random.random() >= application.config.get('QUERY_CAPTURE_SAMPLE', 1.0):
+        return
+    line = json.dumps({
+        'statement': statement,
+        'parameters': parameters if isinstance(parameters, dict) else list(parameters),
+        'duration': round(elapsed, 6),
+        'route': request.url_rule.rule if has_request_context() and request.url_rule is not None else None,
+    }, ensure_ascii=False, default=str)
+    with _capture_lock:
+        if _capture_file is None or _capture_file.name != path:
+            _capture_file = open(path, 'a', encoding='utf-8')
+        _capture_file.write(line + '\n')
+        _capture_file.flush()
+
+
+@sa.event.listens_for(sa.engine.Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@sa.event.listens_for(sa.engine.Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    queries = current()
+    if queries is not None:
+        queries.add(statement, elapsed)
+
+    threshold = application.config.get('SLOW_QUERY_THRESHOLD', 0.2)
+    if threshold is not None and elapsed >= threshold and not statement.startswith('EXPLAIN'):
+        log_slow_query(conn, statement, parameters, executemany, elapsed)
+
+    capture_path = application.config.get('QUERY_CAPTURE_FILE')
+    if capture_path and not executemany and _SELECT.match(statement):
+        capture(capture_path, statement, parameters, elapsed)
+
+
+@sa.event.listens_for(sa.engine.Engine, 'handle_error')
+def _handle_error(exception_context):
+    # after_cursor_execute для упавшего запроса не вызывается
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('query_started'):
+        connection.info['query_started'].pop()
@@ -0,0 +1,211 @@
+from collections import defaultdict
+import sqlalchemy as sa
+import sqlalchemy.orm as so
+from sqlalchemy.sql.util import find_tables
+from app import db
+from app.services import rollups
+from app.models.project_model import Project
+from app.models.block_model import Block
+from app.models.floor_model import Floor
+from app.models.object_model import Object
+from app.models.work_model import Work
+from app.models.work_type_model import WorkType
+from app.models.executor_model import Executor
+
+works = Work.__table__
+floors = Floor.__table__
+blocks = Block.__table__
+projects = Project.__table__
+objects = Object.__table__
+work_types = WorkType.__table__
+executors = Executor.__table__
+floor_rollups = rollups.floor_rollups
+block_rollups = rollups.block_rollups
+project_rollups = rollups.project_rollups
+
+# служебные колонки (копии для индексов) в ответы не попадают
+WORK_COLUMNS = tuple(column for column in works.columns if column.info.get('serialize', True))
+WORK_FIELDS = tuple(column.name for column in WORK_COLUMNS) + (
+    'project', 'block', 'floor', 'object', 'workType', 'executor', 'techOrder', 'category', 'effective_status'
+)
+_DATE_INDEXES = tuple(
+    WORK_FIELDS.index(column.name) for column in WORK_COLUMNS
+    if isinstance(column.type, sa.Date)
+)
+
+# (таблица, условие соединения, таблица, через которую она присоединяется)
+WORK_JOINS = (
+    (floors, works.c.floor_id == floors.c.id, None),
+    (blocks, floors.c.block_id == blocks.c.id, floors),
+    (projects, blocks.c.project_id == projects.c.id, blocks),
+    (objects, works.c.object_id == objects.c.id, None),
+    (work_types, works.c.work_type_id == work_types.c.id, None),
+    (executors, works.c.executor_id == executors.c.id, None),
+)
+
+
+def _works_join(tables):
+    statement = works
+    for table, on, _ in WORK_JOINS:
+        if table in tables:
+            statement = statement.outerjoin(table, on)
+    return statement
+
+
+WORKS_FROM = _works_join({table for table, _, _ in WORK_JOINS})
+
+
+def works_from(*conditions):
+    # Для подсчётов присоединяются только таблицы, на которые ссылаются условия:
+    # внешние соединения по ключу число строк works не меняют.
+    tables = {table for condition in conditions for table in find_tables(condition, check_columns=True)}
+    for table, _, via in reversed(WORK_JOINS):
+        if table in tables and via is not None:
+            tables.add(via)
+    return _works_join(tables)
+
+
+def works_query():
+    return Work.query.options(
+        so.joinedload(Work.floor).joinedload(Floor.block).joinedload(Block.project),
+        so.joinedload(Work.object),
+        so.joinedload(Work.work_type_rel),
+        so.joinedload(Work.executor_rel)
+    )
+
+
+def projects_query():
+    return Project.query.options(
+        so.selectinload(Project.blocks).selectinload(Block.floors),
+        so.selectinload(Project.objects)
+    )
+
+
+def works_select():
+    return sa.select(
+        *WORK_COLUMNS,
+        projects.c.code,
+        blocks.c.name,
+        floors.c.number,
+        objects.c.name,
+        work_types.c.name,
+        executors.c.name,
+        works.c.tech_order,
+        work_types.c.category,
+        Work.effective_status
+    ).select_from(WORKS_FROM)
+
+
+def _counters(table):
+    return (table.c.works_count, table.c.completed_count, table.c.progress_sum)
+
+
+def work_row_to_dict(row):
+    values = list(row)
+    for index in _DATE_INDEXES:
+        value = values[index]
+        if value is not None:
+            values[index] = value.isoformat()
+    return dict(zip(WORK_FIELDS, values))
+
+
+def iter_works(statement=None, chunk_size=500):
+    if statement is None:
+        statement = works_select().order_by(works.c.id)
+    result = db.session.execute(statement.execution_options(yield_per=chunk_size))
+    for row in result:
+        yield work_row_to_dict(row)
+
+
+def get_work(work_id):
+    row = db.session.execute(works_select().where(works.c.id == work_id)).first()
+    return work_row_to_dict(row) if row is not None else None
+
+
+def _rollup_node(node, row):
+    works_count = row.works_count or 0
+    node['works'] = works_count
+    node['completed'] = row.completed_count or 0
+    node['progress'] = round(row.progress_sum / works_count, 2) if works_count else 0
+    return node
+
+
+def work_rollup():
+    project_rows = db.session.execute(
+        sa.select(projects.c.id, projects.c.code, projects.c.name, *_counters(project_rollups))
+        .select_from(projects.outerjoin(project_rollups, project_rollups.c.project_id == projects.c.id))
+        .order_by(projects.c.id)
+    ).all()
+    block_rows = db.session.execute(
+        sa.select(blocks.c.id, blocks.c.name, blocks.c.project_id, *_counters(block_rollups))
+        .select_from(blocks.outerjoin(block_rollups, block_rollups.c.block_id == blocks.c.id))
+    ).all()
+    floor_rows = db.session.execute(
+        sa.select(floors.c.id, floors.c.number, floors.c.block_id, *_counters(floor_rollups))
+        .select_from(floors.outerjoin(floor_rollups, floor_rollups.c.floor_id == floors.c.id))
+    ).all()
+
+    floors_by_block = defaultdict(list)
+    for row in floor_rows:
+        floors_by_block[row.block_id].append(_rollup_node({'id': row.id, 'number': row.number}, row))
+    blocks_by_project = defaultdict(list)
+    for row in sorted(block_rows, key=lambda b: b.name):
+        block = _rollup_node({'id': row.id, 'name': row.name}, row)
+        block['floors'] = sorted(floors_by_block[row.id], key=lambda f: str(f['number']))
+        blocks_by_project[row.project_id].append(block)
+
+    result = []
+    for row in project_rows:
+        project = _rollup_node({'id': row.id, 'code': row.code, 'name': row.name}, row)
+        project['blocks'] = blocks_by_project[row.id]
+        result.append(project)
+    return result
+
+
+def _stats(statuses, total, progress_sum):
+    return {
+        'visible': total,
+        'completed': statuses.get('completed', 0),
+        'in_progress': statuses.get('in-progress', 0),
+        'overdue': statuses.get('overdue', 0),
+        'avg_progress': round(progress_sum / total, 2) if total else 0,
+        'statuses': statuses,
+    }
+
+
+def _overdue_counts():
+    # просроченные незавершённые: (всего, из них начатых) — диапазон по покрывающему
+    # ix_works_end_date_progress, строки таблицы не читаются
+    return db.session.execute(
+        sa.select(
+            sa.func.count(),
+            sa.func.count().filter(Work.progress_state == 'in-progress')
+        ).select_from(works).where(Work.is_overdue)
+    ).one()
+
+
+def work_stats(conditions=()):
+    if not conditions:
+        counters = rollups.totals()
+        overdue, overdue_started = _overdue_counts()
+        statuses = {
+            'completed': counters['completed_count'],
+            'in-progress': counters['in_progress_count'] - overdue_started,
+            'not-started': counters['not_started_count'] - (overdue - overdue_started),
+            'overdue': overdue,
+        }
+        statuses = {status: n for status, n in statuses.items() if n}
+        return _stats(statuses, counters['works_count'], counters['progress_sum'])
+
+    effective_status = Work.effective_status
+    statement = sa.select(
+        effective_status, sa.func.count(), sa.func.coalesce(sa.func.sum(works.c.progress), 0)
+    ).select_from(works_from(*conditions)).where(*conditions).group_by(effective_status)
+
+    statuses = {}
+    total = progress_sum = 0
+    for status, works_count, status_progress in db.session.execute(statement):
+        statuses[status] = works_count
+        total += works_count
+        progress_sum += status_progress
+    return _stats(statuses, total, progress_sum)
@@ -0,0 +1,147 @@
+from collections import defaultdict
+import sqlalchemy as sa
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app import db
+from app.models.block_model import Block
+from app.models.floor_model import Floor
+from app.models.work_model import Work, progress_state
+from app.models.rollup_model import FloorRollup, BlockRollup, ProjectRollup
+
+works = Work.__table__
+floors = Floor.__table__
+blocks = Block.__table__
+floor_rollups = FloorRollup.__table__
+block_rollups = BlockRollup.__table__
+project_rollups = ProjectRollup.__table__
+
+# Счётчики по состоянию без учёта даты: «просрочено» меняется само собой с течением
+# времени, его считает read_models.work_stats по индексу (end_date, progress, status).
+STATUS_COLUMNS = {
+    'not-started': 'not_started_count',
+    'in-progress': 'in_progress_count',
+    'completed': 'completed_count',
+}
+COUNTERS = ('works_count',) + tuple(STATUS_COLUMNS.values()) + ('progress_sum',)
+
+
+def _delta(status, progress, sign):
+    delta = dict.fromkeys(COUNTERS, 0)
+    delta['works_count'] = sign
+    delta[STATUS_COLUMNS[progress_state(status, progress or 0)]] = sign
+    delta['progress_sum'] = sign * (progress or 0)
+    return delta
+
+
+def _upsert(table, key, rows):
+    if not rows:
+        return
+    statement = sqlite_insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[key],
+        set_={name: table.c[name] + statement.excluded[name] for name in COUNTERS}
+    )
+    db.session.execute(statement, rows)
+
+
+def apply_work_changes(changes):
+    # changes: (floor_id, status, progress, +1 | -1) на каждую добавленную/удалённую версию работы
+    per_floor = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for floor_id, status, progress, sign in changes:
+        totals = per_floor[floor_id]
+        for name, value in _delta(status, progress, sign).items():
+            totals[name] += value
+
+    per_floor = {
+        floor_id: totals for floor_id, totals in per_floor.items() if any(totals.values())
+    }
+    if not per_floor:
+        return
+
+    placement = db.session.execute(
+        sa.select(floors.c.id, floors.c.block_id, blocks.c.project_id)
+        .select_from(floors.join(blocks, floors.c.block_id == blocks.c.id))
+        .where(floors.c.id.in_(per_floor))
+    ).all()
+
+    floor_rows = []
+    per_block = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    per_project = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    block_projects = {}
+    for floor_id, block_id, project_id in placement:
+        totals = per_floor[floor_id]
+        floor_rows.append({'floor_id': floor_id, 'block_id': block_id, 'project_id': project_id, **totals})
+        block_projects[block_id] = project_id
+        for name, value in totals.items():
+            per_block[block_id][name] += value
+            per_project[project_id][name] += value
+
+    _upsert(floor_rollups, 'floor_id', floor_rows)
+    _upsert(block_rollups, 'block_id', [
+        {'block_id': block_id, 'project_id': block_projects[block_id], **totals}
+        for block_id, totals in per_block.items()
+    ])
+    _upsert(project_rollups, 'project_id', [
+        {'project_id': project_id, **totals} for project_id, totals in per_project.items()
+    ])
+
+
+def _aggregates():
+    columns = [sa.func.count(works.c.id).label('works_count')]
+    for state, name in STATUS_COLUMNS.items():
+        columns.append(sa.func.count(works.c.id).filter(Work.progress_state == state).label(name))
+    columns.append(sa.func.coalesce(sa.func.sum(works.c.progress), 0).label('progress_sum'))
+    return columns
+
+
+def _expected(group_columns, project_ids=None):
+    statement = sa.select(*group_columns, *_aggregates()).select_from(
+        works
+        .join(floors, works.c.floor_id == floors.c.id)
+        .join(blocks, floors.c.block_id == blocks.c.id)
+    ).group_by(*group_columns)
+    if project_ids is not None:
+        statement = statement.where(blocks.c.project_id.in_(project_ids))
+    return statement
+
+
+def _expected_selects(project_ids=None):
+    return (
+        (floor_rollups, _expected(
+            [floors.c.id.label('floor_id'), blocks.c.id.label('block_id'), blocks.c.project_id], project_ids
+        )),
+        (block_rollups, _expected([blocks.c.id.label('block_id'), blocks.c.project_id], project_ids)),
+        (project_rollups, _expected([blocks.c.project_id], project_ids)),
+    )
+
+
+def rebuild(project_ids=None):
+    for table, select in _expected_selects(project_ids):
+        delete = table.delete()
+        if project_ids is not None:
+            delete = delete.where(table.c.project_id.in_(project_ids))
+        db.session.execute(delete)
+        db.session.execute(table.insert().from_select([c.name for c in select.selected_columns], select))
+
+
+def verify():
+    mismatches = []
+    for table, select in _expected_selects():
+        key = table.primary_key.columns.values()[0].name
+        expected = {row[key]: row for row in db.session.execute(select).mappings()}
+        actual = {row[key]: row for row in db.session.execute(sa.select(table)).mappings()}
+        for node_id in expected.keys() | actual.keys():
+            want = expected.get(node_id)
+            have = actual.get(node_id)
+            want_counters = tuple(want[name] for name in COUNTERS) if want else None
+            have_counters = tuple(have[name] for name in COUNTERS) if have else None
+            # пустой узел (все нули) эквивалентен отсутствующему
+            if not any(want_counters or ()) and not any(have_counters or ()):
+                continue
+            if want_counters != have_counters:
+                mismatches.append((table.name, node_id, want_counters, have_counters))
+    return mismatches
+
+
+def totals():
+    statement = sa.select(*(sa.func.coalesce(sa.func.sum(project_rollups.c[name]), 0) for name in COUNTERS))
+    return dict(zip(COUNTERS, db.session.execute(statement).one()))
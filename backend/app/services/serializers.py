@@ -0,0 +1,94 @@
+from datetime import date, datetime
+from operator import attrgetter
+import sqlalchemy as sa
+from app.models.project_model import Project
+from app.models.work_model import Work
+from app.models.work_type_model import WorkType
+from app.models.executor_model import Executor
+
+_serializers = {}
+
+
+def _column_serializer(model):
+    names = tuple(column.name for column in model.__table__.columns if column.info.get('serialize', True))
+    date_names = tuple(
+        column.name for column in model.__table__.columns
+        if isinstance(column.type, (sa.Date, sa.DateTime))
+    )
+    getter = attrgetter(*names)
+
+    def serialize(instance):
+        result = dict(zip(names, getter(instance)))
+        for name in date_names:
+            value = result[name]
+            # date → YYYY-MM-DD, datetime → полная метка времени, как в read_models
+            if isinstance(value, (date, datetime)):
+                result[name] = value.isoformat()
+        return result
+
+    return serialize
+
+
+def register(model, extra=None):
+    columns = _column_serializer(model)
+
+    if extra is None:
+        _serializers[model] = columns
+        return columns
+
+    def serialize(instance):
+        result = columns(instance)
+        extra(instance, result)
+        return result
+
+    _serializers[model] = serialize
+    return serialize
+
+
+def _project_extra(project, result):
+    result['blocks'] = [
+        {
+            'id': block.id,
+            'name': block.name,
+            'floors': sorted(
+                ({'id': floor.id, 'number': floor.number} for floor in block.floors),
+                key=lambda f: str(f['number'])
+            )
+        }
+        for block in sorted(project.blocks, key=lambda b: b.name)
+    ]
+    result['objects'] = sorted(
+        ({'id': obj.id, 'name': obj.name} for obj in project.objects),
+        key=lambda o: o['name']
+    )
+
+
+def _work_extra(work, result):
+    floor = work.floor
+    block = floor.block if floor else None
+    project = block.project if block else None
+    work_type = work.work_type_rel
+    executor = work.executor_rel
+    obj = work.object
+
+    result['project'] = project.code if project else None
+    result['block'] = block.name if block else None
+    result['floor'] = floor.number if floor else None
+    result['object'] = obj.name if obj else None
+    result['workType'] = work_type.name if work_type else None
+    result['executor'] = executor.name if executor else None
+    result['techOrder'] = work_type.order if work_type else None
+    result['category'] = work_type.category if work_type else None
+    result['effective_status'] = work.effective_status
+
+
+register(Project, _project_extra)
+register(Work, _work_extra)
+register(WorkType)
+register(Executor)
+
+
+def to_dict(instance):
+    if not instance:
+        return None
+    return _serializers[type(instance)](instance)
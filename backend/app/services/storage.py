@@ -0,0 +1,125 @@
+import functools
+import random
+import sqlite3
+import threading
+import time
+import sqlalchemy as sa
+from app import application, db
+from app.services import metrics
+
+# Профиль для нескольких процессов Passenger на одном файле: WAL, чтобы читатели
+# не ждали писателя, и busy_timeout вместо мгновенного "database is locked".
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -20000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+    'foreign_keys': 'ON',
+    'journal_size_limit': 64 * 1024 * 1024,
+}
+
+# прагмы, которые пишут в файл: на соединении mode=ro они падают, их задаёт пишущее
+WRITING_PRAGMAS = ('journal_mode', 'auto_vacuum')
+
+SQLITE_BUSY = 5
+SQLITE_LOCKED = 6
+
+metrics.register('db_busy_retries_total', 'counter', 'Write requests restarted after SQLITE_BUSY.')
+metrics.register('db_wal_checkpoints_total', 'counter', 'Periodic WAL checkpoints by result.')
+
+
+def pragmas():
+    return {**PRAGMAS, **application.config.get('SQLITE_PRAGMAS', {})}
+
+
+@sa.event.listens_for(sa.engine.Engine, 'connect')
+def _apply_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas().items():
+            if value is None:
+                continue
+            try:
+                cursor.execute('PRAGMA {} = {}'.format(name, value))
+            except sqlite3.OperationalError:
+                if name not in WRITING_PRAGMAS:
+                    raise
+    finally:
+        cursor.close()
+
+
+def is_busy(error):
+    orig = getattr(error, 'orig', error)
+    if not isinstance(orig, sqlite3.OperationalError):
+        return False
+    code = getattr(orig, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xff in (SQLITE_BUSY, SQLITE_LOCKED)
+    return 'locked' in str(orig) or 'busy' in str(orig)
+
+
+def retry_on_busy(view):
+    # Повторяем всю единицу работы: после SQLITE_BUSY транзакция уже недействительна.
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        attempts = application.config.get('SQLITE_BUSY_RETRIES', 5)
+        backoff = application.config.get('SQLITE_BUSY_BACKOFF', 0.05)
+        for attempt in range(attempts):
+            try:
+                return view(*args, **kwargs)
+            except sa.exc.OperationalError as e:
+                if not is_busy(e) or attempt == attempts - 1:
+                    raise
+                db.session.rollback()
+                metrics.store.inc('db_busy_retries_total', (('view', view.__name__),))
+                application.logger.warning('%s: database is busy, retry %d', view.__name__, attempt + 1)
+                time.sleep(backoff * 2 ** attempt * (1 + random.random()))
+    return wrapper
+
+
+class Checkpointer:
+    # PASSIVE не ждёт читателей; auto-checkpoint SQLite срабатывает только в пишущем
+    # соединении, а здесь WAL сбрасывается и когда записей давно не было.
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        if not self.interval or db.engine.dialect.name != 'sqlite':
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='wal-checkpoint', daemon=True)
+                self._thread.start()
+
+    def checkpoint(self, mode='PASSIVE'):
+        with db.engine.connect() as connection:
+            busy, log_pages, checkpointed = connection.exec_driver_sql(
+                'PRAGMA wal_checkpoint({})'.format(mode)
+            ).one()
+        metrics.store.inc('db_wal_checkpoints_total', (('result', 'busy' if busy else 'ok'),))
+        return busy, log_pages, checkpointed
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                with application.app_context():
+                    self.checkpoint()
+            except Exception:
+                application.logger.exception('WAL checkpoint failed')
+
+
+checkpointer = Checkpointer(application.config.get('WAL_CHECKPOINT_INTERVAL', 300))
+
+
+@sa.event.listens_for(db.session, 'after_commit')
+def _start_checkpointer(session):
+    # поток запускается после fork воркера, при первой записи
+    checkpointer.start()
@@ -0,0 +1,38 @@
+import csv
+import io
+import json
+from itertools import islice
+
+FORMATS = ('csv', 'ndjson')
+FIELDS = (
+    'id', 'project', 'block', 'floor', 'object', 'workType', 'executor', 'category', 'techOrder',
+    'start_date', 'end_date', 'status', 'priority', 'progress', 'note'
+)
+MIMETYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+
+def iter_csv(works, chunk_size=500):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FIELDS)
+    works = iter(works)
+    while True:
+        writer.writerows([work[field] for field in FIELDS] for work in islice(works, chunk_size))
+        chunk = buffer.getvalue()
+        if not chunk:
+            return
+        yield chunk
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def iter_ndjson(works, chunk_size=500):
+    works = iter(works)
+    while True:
+        lines = [
+            json.dumps({field: work[field] for field in FIELDS}, ensure_ascii=False) + '\n'
+            for work in islice(works, chunk_size)
+        ]
+        if not lines:
+            return
+        yield ''.join(lines)
@@ -0,0 +1,134 @@
+import sqlite3
+import sqlalchemy as sa
+from app import db
+from app.models.work_model import Work, TODAY
+from app.services import rollups
+from app.services.read_models import (
+    works, floors, blocks, projects, objects, work_types, executors, works_from
+)
+
+GLOBAL_FILTERS = ('all', 'completed', 'not-completed', 'today', 'overdue')
+
+STATUS_ORDER = sa.case(
+    {'overdue': 0, 'in-progress': 1, 'not-started': 2, 'completed': 3},
+    value=Work.effective_status,
+    else_=4
+)
+
+# (выражение, по убыванию); works.id всегда добавляется последним ключом.
+SORTS = {
+    'id': (),
+    'technology': ((works.c.tech_order, False),),
+    'progress': ((works.c.progress, True),),
+    'priority': ((works.c.priority, False),),
+    'date': ((works.c.start_date, False),),
+    'end_date': ((works.c.end_date, False),),
+    'status': ((STATUS_ORDER, False),),
+    'floor': (
+        (floors.c.number.op('GLOB')('[0-9]*'), True),
+        (sa.cast(floors.c.number, sa.Integer), False),
+        (floors.c.number, False)
+    ),
+    'category': ((work_types.c.category, False),),
+}
+
+# Ключи этих сортировок — выражения над присоединёнными таблицами, индекса по ним на works
+# нет: курсор на каждой странице сортировал бы всю выборку. Им остаётся page/per_page.
+OFFSET_ONLY_SORTS = ('status', 'floor', 'category')
+
+SEARCH_COLUMNS = (
+    work_types.c.name,
+    objects.c.name,
+    executors.c.name,
+    blocks.c.name,
+    floors.c.number,
+    works.c.note,
+    projects.c.name,
+)
+
+
+@sa.event.listens_for(sa.engine.Engine, 'connect')
+def _register_casefold(dbapi_connection, connection_record):
+    # lower() в SQLite не трогает кириллицу, а все названия у нас на русском.
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.create_function(
+            'casefold', 1, lambda value: value.casefold() if value is not None else None,
+            deterministic=True
+        )
+
+
+def status_condition(status):
+    # для «завершено» и «просрочено» — формы, которые SQLite берёт по индексам
+    if status == 'completed':
+        return Work.is_completed
+    if status == 'overdue':
+        return Work.is_overdue
+    return Work.effective_status == status
+
+
+def work_conditions(args):
+    conditions = []
+
+    project = args.get('project')
+    if project and project != 'all':
+        conditions.append(projects.c.code == project)
+    if args.get('block'):
+        conditions.append(blocks.c.name == args['block'])
+    if args.get('floor'):
+        conditions.append(floors.c.number == args['floor'])
+    if args.get('status'):
+        conditions.append(status_condition(args['status']))
+
+    category = args.get('category')
+    if category and category != 'all':
+        conditions.append(work_types.c.category == category)
+
+    global_filter = args.get('filter', 'all')
+    if global_filter == 'completed':
+        conditions.append(Work.is_completed)
+    elif global_filter == 'not-completed':
+        conditions.append(sa.not_(Work.is_completed))
+    elif global_filter == 'today':
+        # та же дата, что в is_overdue, иначе около полуночи фильтры разойдутся со статусом
+        conditions.append(works.c.start_date <= TODAY)
+        conditions.append(works.c.end_date >= TODAY)
+    elif global_filter == 'overdue':
+        conditions.append(Work.is_overdue)
+
+    search = args.get('search')
+    if search:
+        pattern = '%' + search.casefold().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        conditions.append(sa.or_(*(
+            sa.func.casefold(column).like(pattern, escape='\\') for column in SEARCH_COLUMNS
+        )))
+
+    return conditions
+
+
+def validate_work_args(args, keyset=False):
+    if args.get('filter', 'all') not in GLOBAL_FILTERS:
+        return 'Unknown filter: {}'.format(args['filter'])
+    if args.get('sort', 'id') not in SORTS:
+        return 'Unknown sort: {}'.format(args['sort'])
+    if keyset and args.get('sort') in OFFSET_ONLY_SORTS:
+        return 'Sort {} does not support cursor pagination, use page and per_page'.format(args['sort'])
+    return None
+
+
+def sort_keys(args):
+    return SORTS[args.get('sort', 'id')] + ((works.c.id, False),)
+
+
+def apply_work_args(statement, args):
+    return statement.where(*work_conditions(args)).order_by(
+        *(expression.desc() if descending else expression for expression, descending in sort_keys(args))
+    )
+
+
+def count_works(args):
+    conditions = work_conditions(args)
+    if not conditions:
+        return rollups.totals()['works_count']
+    return db.session.scalar(
+        sa.select(sa.func.count()).select_from(works_from(*conditions)).where(*conditions)
+    )
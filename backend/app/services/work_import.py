@@ -0,0 +1,200 @@
+import csv
+import io
+import json
+from datetime import datetime
+import sqlalchemy as sa
+from app import db
+from app.models.project_model import Project
+from app.models.block_model import Block
+from app.models.floor_model import Floor
+from app.models.object_model import Object
+from app.models.work_type_model import WorkType
+from app.models.executor_model import Executor
+from app.services import work_writes
+
+STATUSES = ('not-started', 'in-progress', 'completed', 'overdue')
+FORMATS = ('ndjson', 'csv')
+
+
+def iter_ndjson(stream):
+    for line_no, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_no, line, 'Invalid JSON: {}'.format(e)
+            continue
+        if not isinstance(row, dict):
+            yield line_no, line, 'Expected a JSON object'
+            continue
+        yield line_no, row, None
+
+
+def iter_csv(stream):
+    reader = csv.DictReader(stream)
+    for row in reader:
+        # лишние ячейки DictReader кладёт под ключ None; в отчёт идут только поля заголовка
+        extra = row.pop(None, None)
+        if extra is not None:
+            yield reader.line_num, row, 'Too many columns: expected {}, got {}'.format(
+                len(reader.fieldnames), len(reader.fieldnames) + len(extra)
+            )
+            continue
+        yield reader.line_num, row, None
+
+
+def iter_rows(binary_stream, fmt):
+    text = io.TextIOWrapper(binary_stream, encoding='utf-8-sig', newline='')
+    return iter_csv(text) if fmt == 'csv' else iter_ndjson(text)
+
+
+class Lookups:
+    # Справочники грузятся один раз на импорт; имена → id без запросов на каждую строку.
+
+    def __init__(self):
+        self.projects = dict(db.session.execute(sa.select(Project.code, Project.id)).all())
+        self.blocks = {
+            (project_id, name): block_id
+            for block_id, project_id, name in db.session.execute(
+                sa.select(Block.id, Block.project_id, Block.name)
+            )
+        }
+        self.floors = {
+            (block_id, number): floor_id
+            for floor_id, block_id, number in db.session.execute(
+                sa.select(Floor.id, Floor.block_id, Floor.number)
+            )
+        }
+        self.objects = {
+            (project_id, name): object_id
+            for object_id, project_id, name in db.session.execute(
+                sa.select(Object.id, Object.project_id, Object.name)
+            )
+        }
+        self.work_types = dict(db.session.execute(sa.select(WorkType.name, WorkType.id)).all())
+        self.executors = dict(db.session.execute(sa.select(Executor.name, Executor.id)).all())
+
+    def resolve(self, row):
+        project_id = self.projects.get(_text(row, 'project'))
+        if project_id is None:
+            raise ValueError('Unknown project: {}'.format(row.get('project')))
+        block_id = self.blocks.get((project_id, _text(row, 'block')))
+        if block_id is None:
+            raise ValueError('Unknown block: {}'.format(row.get('block')))
+        floor_id = self.floors.get((block_id, _text(row, 'floor')))
+        if floor_id is None:
+            raise ValueError('Unknown floor: {}'.format(row.get('floor')))
+        object_id = self.objects.get((project_id, _text(row, 'object')))
+        if object_id is None:
+            raise ValueError('Unknown object: {}'.format(row.get('object')))
+        work_type_id = self.work_types.get(_text(row, 'workType'))
+        if work_type_id is None:
+            raise ValueError('Unknown work type: {}'.format(row.get('workType')))
+        executor_id = self.executors.get(_text(row, 'executor'))
+        if executor_id is None:
+            raise ValueError('Unknown executor: {}'.format(row.get('executor')))
+        return {
+            'floor_id': floor_id,
+            'object_id': object_id,
+            'work_type_id': work_type_id,
+            'executor_id': executor_id,
+        }
+
+
+def _text(row, key):
+    value = row.get(key)
+    return str(value).strip() if value is not None else None
+
+
+def _int(row, key, low=None, high=None):
+    try:
+        value = int(row.get(key))
+    except (TypeError, ValueError):
+        raise ValueError('{} must be an integer'.format(key))
+    if (low is not None and value < low) or (high is not None and value > high):
+        raise ValueError('{} must be between {} and {}'.format(key, low, high))
+    return value
+
+
+def _date(row, key):
+    try:
+        return datetime.strptime(_text(row, key) or '', '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError('{} must be a date in YYYY-MM-DD format'.format(key))
+
+
+def work_row(row, lookups):
+    status = _text(row, 'status')
+    if status not in STATUSES:
+        raise ValueError('Unknown status: {}'.format(status))
+    values = lookups.resolve(row)
+    values.update({
+        'start_date': _date(row, 'start_date'),
+        'end_date': _date(row, 'end_date'),
+        'status': status,
+        'priority': _int(row, 'priority'),
+        'progress': _int(row, 'progress', 0, 100),
+        'note': row.get('note') or None,
+    })
+    return values
+
+
+def import_works(rows, batch_size=1000, on_reject=None, on_batch=None):
+    lookups = Lookups()
+    summary = {'imported': 0, 'rejected': 0, 'batches': 0}
+    batch = []
+
+    def flush():
+        work_writes.insert_works(batch)
+        db.session.commit()
+        summary['imported'] += len(batch)
+        summary['batches'] += 1
+        batch.clear()
+        if on_batch:
+            on_batch(summary)
+
+    for line_no, row, error in rows:
+        if error is None:
+            try:
+                batch.append(work_row(row, lookups))
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            summary['rejected'] += 1
+            if on_reject:
+                on_reject(line_no, row, error)
+            continue
+        if len(batch) >= batch_size:
+            flush()
+
+    if batch:
+        flush()
+    return summary
+
+
+class RejectFile:
+
+    def __init__(self, path, fmt):
+        self.path = path
+        self.fmt = fmt
+        self._file = None
+        self._writer = None
+
+    def __call__(self, line_no, row, error):
+        if self._file is None:
+            self._file = open(self.path, 'w', encoding='utf-8', newline='')
+        if self.fmt == 'csv' and isinstance(row, dict):
+            if self._writer is None:
+                self._writer = csv.DictWriter(
+                    self._file, fieldnames=['line', 'error'] + list(row.keys()), extrasaction='ignore'
+                )
+                self._writer.writeheader()
+            self._writer.writerow({'line': line_no, 'error': error, **row})
+        else:
+            self._file.write(json.dumps({'line': line_no, 'error': error, 'row': row}, ensure_ascii=False) + '\n')
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
@@ -0,0 +1,107 @@
+import sqlalchemy as sa
+from app import db
+from app.models.work_model import Work
+from app.models.work_type_model import WorkType
+from app.services import changes, rollups
+
+works = Work.__table__
+work_types = WorkType.__table__
+
+
+def with_tech_order(rows):
+    # Core-вставки минуют событие Work.before_insert: порядок технологий одним запросом на пакет
+    orders = dict(db.session.execute(
+        sa.select(work_types.c.id, work_types.c.order)
+        .where(work_types.c.id.in_({row['work_type_id'] for row in rows}))
+    ).all())
+    return [{**row, 'tech_order': orders.get(row['work_type_id'], 0)} for row in rows]
+
+
+def insert_with_ids(table, rows):
+    # id строк в порядке rows
+    if not rows:
+        return []
+    # RETURNING с порядком параметров SQLite выполняет построчно, поэтому один executemany,
+    # где id задаём сами: max(id) + 1 в самой вставке. Первая строка берёт блокировку записи,
+    # так что id идут подряд и восстанавливаются по максимуму, не завися от выбора rowid
+    next_id = sa.select(sa.func.coalesce(sa.func.max(table.c.id), 0) + 1).scalar_subquery()
+    db.session.execute(sa.insert(table).values(id=next_id), rows)
+    last_id = db.session.scalar(sa.select(sa.func.max(table.c.id)))
+    ids = list(range(last_id - len(rows) + 1, last_id + 1))
+    inserted = db.session.scalar(sa.select(sa.func.count()).where(table.c.id >= ids[0]))
+    if inserted != len(rows):
+        raise RuntimeError('Expected {} new rows in {} after id {}, found {}'.format(
+            len(rows), table.name, ids[0] - 1, inserted
+        ))
+    return ids
+
+
+def insert_works(rows):
+    if not rows:
+        return []
+    ids = insert_with_ids(works, with_tech_order(rows))
+    changes.stamp_works('created', ids)
+    rollups.apply_work_changes([(row['floor_id'], row['status'], row['progress'], 1) for row in rows])
+    return ids
+
+
+def update_works(rows):
+    if not rows:
+        return []
+    ids = [row['id'] for row in rows]
+    previous = db.session.execute(
+        sa.select(works.c.floor_id, works.c.status, works.c.progress).where(works.c.id.in_(ids))
+    ).all()
+    db.session.execute(sa.update(Work), with_tech_order(rows))
+    changes.stamp_works('updated', ids)
+    rollups.apply_work_changes(
+        [(row.floor_id, row.status, row.progress, -1) for row in previous]
+        + [(row['floor_id'], row['status'], row['progress'], 1) for row in rows]
+    )
+    return ids
+
+
+def delete_works(condition):
+    # каскад по floors/objects удалил бы работы молча, поэтому удаляем их явно и пишем tombstone
+    doomed = db.session.execute(
+        sa.select(works.c.id, works.c.floor_id, works.c.status, works.c.progress).where(condition)
+    ).all()
+    if not doomed:
+        return []
+    ids = [row.id for row in doomed]
+    changes.record('work', 'deleted', ids)
+    rollups.apply_work_changes([(row.floor_id, row.status, row.progress, -1) for row in doomed])
+    db.session.execute(sa.delete(works).where(works.c.id.in_(ids)))
+    return ids
+
+
+REFERENCES = (
+    ('floor_id', 'floors', 'Unknown floor'),
+    ('object_id', 'objects', 'Unknown object'),
+    ('executor_id', 'executors', 'Unknown executor'),
+    ('work_type_id', 'work_types', 'Unknown work type'),
+)
+
+
+def reference_errors(rows):
+    existing = {}
+    for column, table_name, _ in REFERENCES:
+        table = db.metadata.tables[table_name]
+        wanted = {row[column] for row in rows}
+        existing[column] = set(db.session.execute(
+            sa.select(table.c.id).where(table.c.id.in_(wanted))
+        ).scalars()) if wanted else set()
+
+    errors = []
+    for row in rows:
+        row_errors = {
+            column: [message] for column, _, message in REFERENCES if row[column] not in existing[column]
+        }
+        errors.append(row_errors or None)
+    return errors
+
+
+def existing_work_ids(ids):
+    if not ids:
+        return set()
+    return set(db.session.execute(sa.select(works.c.id).where(works.c.id.in_(ids))).scalars())
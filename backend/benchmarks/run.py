@@ -0,0 +1,253 @@
+"""API benchmarks at several data scales.
+
+    python benchmarks/run.py --scales 1,10,100 --output bench.json
+    python benchmarks/run.py --baseline bench.json --output bench-new.json
+
+Scale factor N means N projects x 4 blocks x 10 floors x 25 works (1000 works per unit).
+Each scale runs in its own process against a fresh SQLite database in a temporary
+directory; config.py has to take the database from DATABASE_URL.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from statistics import mean, quantiles
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _work_body(ctx, i):
+    return dict(ctx['work'], progress=i % 100, note=f'bench {i}')
+
+
+def _project_body(ctx, i, floors=5):
+    return {
+        'code': f'bench-{i}',
+        'icon': '🏗️',
+        'name': f'Bench {i}',
+        'start_date': '2025-01-01',
+        'end_date': '2025-12-31',
+        'blocks': [{'name': name, 'floors': [str(n) for n in range(1, floors + 1)]} for name in ('А', 'Б')],
+        'objects': ['Квартиры', 'МОП'],
+    }
+
+
+# (имя, метод, путь(ctx, i), тело(ctx, i)); мутации идут по порядку create → update → delete
+CASES = [
+    ('projects.list', 'GET', lambda ctx, i: '/api/projects', None),
+    ('projects.get', 'GET', lambda ctx, i: f"/api/projects/{ctx['project']}", None),
+    ('projects.create', 'POST', lambda ctx, i: '/api/projects', _project_body),
+    ('projects.update', 'PUT', lambda ctx, i: f'/api/projects/bench-{i}',
+     lambda ctx, i: _project_body(ctx, i, floors=8)),
+    ('projects.delete', 'DELETE', lambda ctx, i: f'/api/projects/bench-{i}', None),
+    ('works.list', 'GET', lambda ctx, i: '/api/works', None),
+    ('works.page', 'GET', lambda ctx, i: '/api/works?per_page=50&page=10&sort=end_date', None),
+    ('works.keyset', 'GET', lambda ctx, i: '/api/works?limit=50&sort=end_date', None),
+    ('works.search', 'GET', lambda ctx, i: '/api/works?per_page=50&search=штукат', None),
+    ('works.stats', 'GET', lambda ctx, i: f"/api/works/stats?project={ctx['project']}", None),
+    ('works.rollup', 'GET', lambda ctx, i: '/api/works/rollup', None),
+    ('works.get', 'GET', lambda ctx, i: f"/api/works/{ctx['work_ids'][i % len(ctx['work_ids'])]}", None),
+    ('works.create', 'POST', lambda ctx, i: '/api/works', _work_body),
+    ('works.update', 'PUT', lambda ctx, i: f"/api/works/{ctx['created'][i]}",
+     lambda ctx, i: dict(_work_body(ctx, i), status='completed', progress=100)),
+    ('works.delete', 'DELETE', lambda ctx, i: f"/api/works/{ctx['created'][i]}", None),
+    ('work_types.list', 'GET', lambda ctx, i: '/api/work_types', None),
+    ('work_types.create', 'POST', lambda ctx, i: '/api/work_types',
+     lambda ctx, i: {'name': f'bench {i}', 'order': 99, 'color': '#000000', 'category': 'Bench'}),
+    ('executors.list', 'GET', lambda ctx, i: '/api/executors', None),
+    ('executors.create', 'POST', lambda ctx, i: '/api/executors', lambda ctx, i: {'name': f'bench {i}'}),
+]
+
+
+def _percentile(samples, q):
+    if len(samples) < 2:
+        return samples[0]
+    return quantiles(samples, n=100, method='inclusive')[q - 1]
+
+
+def _build(scale, base_date):
+    from app import db
+    from app.services import generator
+
+    db.create_all()
+    return generator.generate(
+        projects=scale, blocks=4, floors=10, works_per_floor=25, objects=5,
+        base_date=base_date
+    )
+
+
+def _context():
+    import sqlalchemy as sa
+    from app import db
+    from app.models import Work, Project
+
+    project = db.session.execute(sa.select(Project.code).order_by(Project.id)).scalar()
+    work_ids = db.session.execute(sa.select(Work.id).order_by(Work.id).limit(1000)).scalars().all()
+    work = db.session.get(Work, work_ids[0])
+    return {
+        'project': project,
+        'work_ids': work_ids,
+        'work': {
+            'executor_id': work.executor_id,
+            'work_type_id': work.work_type_id,
+            'floor_id': work.floor_id,
+            'object_id': work.object_id,
+            'start_date': work.start_date.isoformat(),
+            'end_date': work.end_date.isoformat(),
+            'status': 'in-progress',
+            'priority': str(work.priority),
+        },
+        'created': [],
+    }
+
+
+def _call(client, method, path, body):
+    response = client.open(path, method=method, json=body)
+    response.get_data()  # потоковые ответы дочитываем, иначе время не учитывает генерацию
+    return response
+
+
+def _run_case(client, ctx, counter, case, repeat):
+    name, method, path, body = case
+    samples = []
+    statuses = set()
+    queries = peak = None
+    # итерация 0 — прогрев, последняя — под tracemalloc (он искажает время)
+    for i in range(repeat + 2):
+        traced = i == repeat + 1
+        args = (method, path(ctx, i), body(ctx, i) if body else None)
+        counter[0] = 0
+        if traced:
+            tracemalloc.start()
+            response = _call(client, *args)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            queries = counter[0]
+        else:
+            started = time.perf_counter()
+            response = _call(client, *args)
+            elapsed = time.perf_counter() - started
+            if i:
+                samples.append(elapsed * 1000)
+        statuses.add(response.status_code)
+        if name == 'works.create' and response.status_code == 201:
+            ctx['created'].append(response.get_json()['id'])
+    return {
+        'p50_ms': round(_percentile(samples, 50), 3),
+        'p95_ms': round(_percentile(samples, 95), 3),
+        'mean_ms': round(mean(samples), 3),
+        'queries': queries,
+        'peak_kib': round(peak / 1024, 1),
+        'status': sorted(statuses),
+    }
+
+
+def run_scale(scale, repeat, only, base_date):
+    import sqlalchemy as sa
+    from app import application, db
+
+    if application.config['SQLALCHEMY_DATABASE_URI'] != os.environ['DATABASE_URL']:
+        raise SystemExit('config.py ignores DATABASE_URL; refusing to benchmark against the real database')
+
+    with application.app_context():
+        started = time.perf_counter()
+        dataset = _build(scale, base_date)
+        dataset['build_s'] = round(time.perf_counter() - started, 2)
+        ctx = _context()
+        counter = [0]
+        for engine in db.engines.values():
+            sa.event.listen(engine, 'before_cursor_execute', lambda *args: counter.__setitem__(0, counter[0] + 1))
+        db.session.remove()
+
+    client = application.test_client()
+    endpoints = {}
+    for case in CASES:
+        if only and not any(case[0].startswith(prefix) for prefix in only):
+            continue
+        endpoints[case[0]] = _run_case(client, ctx, counter, case, repeat)
+        print(f"  {case[0]:<20} p50 {endpoints[case[0]]['p50_ms']:>9.2f} ms  "
+              f"p95 {endpoints[case[0]]['p95_ms']:>9.2f} ms  {endpoints[case[0]]['queries']:>4} queries",
+              file=sys.stderr)
+    return {'dataset': dataset, 'endpoints': endpoints}
+
+
+def _spawn(scale, args, workdir):
+    env = dict(os.environ)
+    env['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, f'bench-{scale}.db')
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [BACKEND_DIR, env.get('PYTHONPATH')]))
+    output = os.path.join(workdir, f'bench-{scale}.json')
+    command = [sys.executable, os.path.abspath(__file__), '--worker', str(scale), '--output', output,
+               '--repeat', str(args.repeat), '--base-date', args.base_date]
+    if args.only:
+        command += ['--only', args.only]
+    # cwd — временный каталог, чтобы logs/ приложения не попадали в репозиторий
+    subprocess.run(command, env=env, cwd=workdir, check=True)
+    with open(output, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare(baseline, results):
+    for scale, current in results['scales'].items():
+        previous = baseline.get('scales', {}).get(scale)
+        if not previous:
+            continue
+        print(f'scale {scale}:', file=sys.stderr)
+        for name, stats in current['endpoints'].items():
+            old = previous['endpoints'].get(name)
+            if not old:
+                continue
+            change = (stats['p50_ms'] - old['p50_ms']) / old['p50_ms'] * 100 if old['p50_ms'] else 0
+            print(f"  {name:<20} p50 {old['p50_ms']:>9.2f} -> {stats['p50_ms']:>9.2f} ms ({change:+.0f}%)  "
+                  f"queries {old['queries']} -> {stats['queries']}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', default='1,10,100', help='Comma-separated scale factors.')
+    parser.add_argument('--repeat', type=int, default=20, help='Timed calls per endpoint.')
+    parser.add_argument('--only', help='Comma-separated endpoint name prefixes, e.g. works,projects.get')
+    parser.add_argument('--base-date', default='2025-06-01', help='Dataset "today", fixed so runs are comparable.')
+    parser.add_argument('--output', default='bench.json')
+    parser.add_argument('--baseline', help='Previous results to compare against.')
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    only = args.only.split(',') if args.only else None
+    if args.worker is not None:
+        base_date = datetime.strptime(args.base_date, '%Y-%m-%d').date()
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(run_scale(args.worker, args.repeat, only, base_date), f)
+        return
+
+    results = {
+        'meta': {
+            'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+            'base_date': args.base_date,
+        },
+        'scales': {},
+    }
+    with tempfile.TemporaryDirectory(prefix='bench-') as workdir:
+        for scale in args.scales.split(','):
+            print(f'scale {scale}:', file=sys.stderr)
+            results['scales'][scale] = _spawn(int(scale), args, workdir)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, sort_keys=True, ensure_ascii=False)
+    print(f'Results written to {args.output}', file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            compare(json.load(f), results)
+
+
+if __name__ == '__main__':
+    main()
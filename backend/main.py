@@ -1,7 +1,11 @@
+import os
+import time
+import click
 import sqlalchemy as sa
 import sqlalchemy.orm as so
 from app import application, db
 from app.models import User, Project, Work, Block, Floor, Object
+from app.services import rollups, work_import, generator, index_advisor, maintenance
 
 
 @application.cli.group()
@@ -12,8 +16,136 @@ def db_commands():
 def create_all():
     with application.app_context():
         db.create_all()
+        # auto_vacuum нельзя задать на каждом соединении (читающее mode=ro упадёт), а после
+        # первой записи в файл он меняется только через VACUUM — для новой базы это дёшево
+        if db.engine.dialect.name == 'sqlite' and not maintenance.incremental_vacuum_enabled():
+            maintenance.vacuum()
         print("Database tables created.")
 
+@db_commands.command()
+@click.option('--check', is_flag=True, help='Only compare rollups with the works table.')
+def rebuild_rollups(check):
+    with application.app_context():
+        if not check:
+            rollups.rebuild()
+            db.session.commit()
+            print("Rollups rebuilt.")
+        mismatches = rollups.verify()
+        for table, node_id, expected, actual in mismatches:
+            print(f"{table} {node_id}: expected {expected}, got {actual}")
+        if mismatches:
+            raise SystemExit(1)
+        print("Rollups are consistent.")
+
+@db_commands.command()
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(work_import.FORMATS), help='Defaults to the file extension.')
+@click.option('--batch-size', default=1000, show_default=True)
+@click.option('--rejects', 'rejects_path', type=click.Path(dir_okay=False), help='Where to write rejected rows.')
+def import_works(path, fmt, batch_size, rejects_path):
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+    rejects_path = rejects_path or f"{path}.rejects.{'csv' if fmt == 'csv' else 'ndjson'}"
+    reject_file = work_import.RejectFile(rejects_path, fmt)
+
+    def on_batch(summary):
+        print(f"  {summary['imported']} imported, {summary['rejected']} rejected")
+
+    with application.app_context(), open(path, 'rb') as stream:
+        try:
+            summary = work_import.import_works(
+                work_import.iter_rows(stream, fmt), batch_size, reject_file, on_batch
+            )
+        finally:
+            reject_file.close()
+    print(f"Imported {summary['imported']} works in {summary['batches']} batches, rejected {summary['rejected']}.")
+    if summary['rejected']:
+        print(f"Rejected rows: {rejects_path}")
+
+@db_commands.command()
+@click.option('--projects', default=10, show_default=True)
+@click.option('--blocks', default=4, show_default=True, help='Blocks per project.')
+@click.option('--floors', default=10, show_default=True, help='Floors per block.')
+@click.option('--works', default=25, show_default=True, help='Works per floor.')
+@click.option('--objects', default=5, show_default=True, help='Objects per project.')
+@click.option('--seed', default=42, show_default=True)
+@click.option('--base-date', type=click.DateTime(formats=['%Y-%m-%d']), help='Defaults to today.')
+@click.option('--prefix', default='gen', show_default=True, help='Prefix for generated project codes.')
+@click.option('--batch-size', default=10000, show_default=True)
+@click.option('--reset', is_flag=True, help='Delete all projects and works first.')
+def generate(projects, blocks, floors, works, objects, seed, base_date, prefix, batch_size, reset):
+    with application.app_context():
+        if reset:
+            generator.reset()
+        started = time.perf_counter()
+        summary = generator.generate(
+            projects=projects, blocks=blocks, floors=floors, works_per_floor=works, objects=objects,
+            seed=seed, base_date=base_date.date() if base_date else None, prefix=prefix,
+            batch_size=batch_size, on_batch=lambda total: print(f"  {total} works")
+        )
+    print(f"Generated {summary['projects']} projects, {summary['blocks']} blocks, "
+          f"{summary['floors']} floors, {summary['works']} works in {time.perf_counter() - started:.1f}s.")
+
+@db_commands.command()
+@click.option('--workload', type=click.Path(exists=True, dir_okay=False),
+              help='NDJSON of captured statements. Defaults to QUERY_CAPTURE_FILE.')
+@click.option('--candidate', 'candidates', multiple=True,
+              help='Extra candidate on works as comma-separated columns, e.g. status,end_date.')
+@click.option('--only-extra', is_flag=True, help='Evaluate only the --candidate indexes.')
+@click.option('--repeat', default=3, show_default=True, help='Runs per statement; the best time is used.')
+@click.option('--min-gain', default=5.0, show_default=True, help='Minimum gain, percent of workload time.')
+@click.option('--emit-migration', is_flag=True, help='Write an Alembic migration for the chosen indexes.')
+@click.option('-d', '--directory', help='Migrations directory, as for flask db.')
+def index_advice(workload, candidates, only_extra, repeat, min_gain, emit_migration, directory):
+    workload = workload or application.config.get('QUERY_CAPTURE_FILE')
+    if not workload or not os.path.exists(workload):
+        raise click.UsageError('No workload: pass --workload or set QUERY_CAPTURE_FILE and replay some traffic.')
+    extra = tuple(tuple(c.strip() for c in candidate.split(',')) for candidate in candidates)
+    candidates = extra if only_extra else index_advisor.CANDIDATES + extra
+
+    def on_round(total, scores):
+        print(f"Workload {total * 1000:.1f} ms; candidates:")
+        for gain, columns, _ in scores:
+            print(f"  {index_advisor.index_name(columns):<40} {gain * 1000:+10.1f} ms ({gain / total * 100 if total else 0:+.1f}%)")
+
+    with application.app_context():
+        statements = index_advisor.load_workload(workload)
+        print(f"{len(statements)} distinct statements, {sum(s['count'] for s in statements)} executions.")
+        with index_advisor.Advisor(statements, repeat=repeat) as advisor:
+            advice = advisor.advise(candidates, min_gain=min_gain, on_round=on_round)
+
+    if not advice['chosen']:
+        print(f"No candidate saves {min_gain}% or more.")
+        return
+    print(f"Estimated workload time {advice['baseline'] * 1000:.1f} ms -> {advice['final'] * 1000:.1f} ms:")
+    for choice in advice['chosen']:
+        print(f"  {index_advisor.index_name(choice['columns'])} ({', '.join(choice['columns'])}) saves {choice['gain'] * 1000:.1f} ms")
+        for entry, before, after in choice['changed']:
+            print(f"    x{entry['count']} {' '.join(entry['statement'].split())[:100]}...")
+            print(f"      before: {'; '.join(before)}")
+            print(f"      after:  {'; '.join(after)}")
+    if emit_migration:
+        path = index_advisor.write_migration(
+            directory or application.extensions['migrate'].directory, [c['columns'] for c in advice['chosen']]
+        )
+        print(f"Migration written to {path}; add the same sa.Index entries to Work.__table_args__.")
+
+@db_commands.command(name='maintenance')
+@click.option('--task', 'tasks', multiple=True, type=click.Choice(list(maintenance.TASKS)),
+              help='Run only these tasks; all of them by default.')
+@click.option('--vacuum', 'full_vacuum', is_flag=True,
+              help='Rewrite the file with VACUUM first; enables incremental vacuum on an old database.')
+def run_maintenance(tasks, full_vacuum):
+    with application.app_context():
+        results = []
+        if full_vacuum:
+            results.append(maintenance.run_task('vacuum', maintenance.vacuum))
+        for name in tasks or maintenance.TASKS:
+            results.append(maintenance.run_task(name))
+    for result in results:
+        print(f"{result['task']}: {result['result']} in {result['seconds'] * 1000:.1f} ms, "
+              f"{result['reclaimed']} pages reclaimed")
+    print(f"Database: {results[-1]['file_bytes']} bytes, {results[-1]['freelist_pages']} free pages.")
+
 if __name__ == "__main__":
     application.run(host="0.0.0.0", port=80, debug=False)
 
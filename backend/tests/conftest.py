@@ -0,0 +1,21 @@
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# config.py берёт базу из DATABASE_URL, как и в benchmarks/run.py; логи приложение
+# пишет в ./logs, поэтому рабочий каталог тоже временный
+_directory = tempfile.mkdtemp(prefix='backend-tests-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_directory, 'test.db')
+os.chdir(_directory)
+
+from app import application
+from app.services import maintenance, metrics
+
+# файлы метрик и планировщика по умолчанию лежат в backend/instance; хранилище и
+# планировщик создаются при импорте приложения, поэтому каталоги переназначаем и им
+application.config.update(METRICS_DIR=os.path.join(_directory, 'metrics'), MAINTENANCE_DIR=_directory)
+metrics.store.directory = application.config['METRICS_DIR']
+maintenance.scheduler.directory = application.config['MAINTENANCE_DIR']
@@ -0,0 +1,53 @@
+import pytest
+import sqlalchemy as sa
+from app import application, db
+from app.services import generator
+
+WORKS_PER_PROJECT = 4 * 10 * 5
+
+
+@pytest.fixture(scope='module')
+def client():
+    application.config.update(TESTING=True, MAINTENANCE_ENABLED=False)
+    with application.app_context():
+        db.create_all()
+    return application.test_client()
+
+
+def add_projects(count, prefix):
+    with application.app_context():
+        generator.generate(projects=count, blocks=4, floors=10, works_per_floor=5, objects=2, prefix=prefix)
+
+
+def count_queries(client, url):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with application.app_context():
+        engines = list(db.engines.values())
+    for engine in engines:
+        sa.event.listen(engine, 'before_cursor_execute', record)
+    try:
+        response = client.get(url)
+        # тело потоковое: запросы к базе идут, пока оно читается
+        body = response.get_json()
+        response.close()
+    finally:
+        for engine in engines:
+            sa.event.remove(engine, 'before_cursor_execute', record)
+    assert response.status_code == 200
+    return len(statements), body
+
+
+def test_works_list_query_count_does_not_grow_with_rows(client):
+    add_projects(1, 'small')
+    small_queries, small = count_queries(client, '/api/works')
+    assert len(small) == WORKS_PER_PROJECT
+
+    add_projects(9, 'large')
+    large_queries, large = count_queries(client, '/api/works')
+    assert len(large) == 10 * WORKS_PER_PROJECT
+
+    assert large_queries == small_queries
@@ -78,6 +78,35 @@ export const getWorks = async () => {
     return handleResponse(response);
 };
 
+export const getWorksPage = async (params = {}) => {
+    const query = new URLSearchParams(params).toString();
+    const response = await fetch(`${API_URL}/works?${query}`);
+    return handleResponse(response);
+};
+
+export const getWorkChanges = async (since) => {
+    const response = await fetch(`${API_URL}/works/changes?since=${since}`);
+    return handleResponse(response);
+};
+
+export const subscribeToChanges = (onEvent) => {
+    const source = new EventSource(`${API_URL}/events`);
+    ['work.created', 'work.updated', 'work.deleted', 'project.created', 'project.updated', 'project.deleted', 'resync']
+        .forEach((type) => source.addEventListener(type, (e) => onEvent(type, JSON.parse(e.data))));
+    return () => source.close();
+};
+
+export const getWorksStats = async (params = {}) => {
+    const query = new URLSearchParams(params).toString();
+    const response = await fetch(`${API_URL}/works/stats?${query}`);
+    return handleResponse(response);
+};
+
+export const getWorksRollup = async () => {
+    const response = await fetch(`${API_URL}/works/rollup`);
+    return handleResponse(response);
+};
+
 export const getWorkById = async (id) => {
     const response = await fetch(`${API_URL}/works/${id}`);
     return handleResponse(response);
@@ -105,6 +134,17 @@ export const updateWork = async (id, workData) => {
     return handleResponse(response);
 };
 
+export const bulkWorks = async (operations) => {
+    const response = await fetch(`${API_URL}/works/bulk`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify(operations),
+    });
+    return handleResponse(response);
+};
+
 export const deleteWork = async (id) => {
     const response = await fetch(`${API_URL}/works/${id}`, {
         method: 'DELETE',